@@ -1,19 +1,33 @@
 import os
 import io
+import json
+import time
 import uuid
+import shutil
+import threading
+from dataclasses import asdict
 from typing import List
 from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import uvicorn
-import chromadb
 
 # Import your custom modules
 from text_extraction import extractor
 import text_enrichment
 import tts
 import rag_query
+import chapters
+import encoding
+import ingestion
+from tts_models import model_registry
+from jobs import job_manager
+from llm_clients import llm_clients
+from embeddings import embedding_engine
+from query_cache import query_cache
+from render_cache import get_render_cache_stats
 
 app = FastAPI(title="Audiobook Generator API", version="2.0")
 
@@ -36,6 +50,11 @@ class TTSRequest(BaseModel):
     voice: str = "en-US-JennyNeural"
     rate: int = 180
 
+class AudiobookRequest(TTSRequest):
+    format: str = "mp3"
+    bitrate: str = "64k"
+    pages_per_chapter: int = chapters.CHAPTER_PAGES
+
 class ChatRequest(BaseModel):
     query: str
     top_k: int = 5
@@ -51,34 +70,113 @@ class BytesIOWrapper(io.BytesIO):
 
 
 # --- Helper: Vector DB Ingestion ---
-def ingest_text_to_chroma(text: str, filename: str):
+def ingest_text_to_chroma(text: str, filename: str) -> dict:
     """
-    Chunks the text and saves it to ChromaDB so RAG can find it.
+    Chunks the text and upserts it into ChromaDB so RAG can find it.
+    Re-ingesting a file replaces its previous chunks instead of duplicating them.
     """
-    try:
-        # 1. Connect to DB
-        client = chromadb.PersistentClient(path="./vectordb")
-        collection = client.get_or_create_collection(name="audiobook_embeddings")
-
-        # 2. Simple Chunking (Split by paragraphs)
-        chunks = [c.strip() for c in text.split('\n\n') if len(c.strip()) > 50]
-
-        if not chunks:
-            return
-
-        # 3. Add to ChromaDB
-        ids = [f"{filename}_{str(uuid.uuid4())[:8]}" for _ in chunks]
-        metadatas = [{"source": filename, "index": i} for i in range(len(chunks))]
-
-        collection.add(
-            documents=chunks,
-            metadatas=metadatas,
-            ids=ids
-        )
-        print(f"✅ Ingested {len(chunks)} chunks from {filename}")
-
-    except Exception as e:
-        print(f"⚠️ Warning: Failed to ingest text to DB: {e}")
+    stats = ingestion.ingest_text(text, source=filename, db_dir="./vectordb")
+    print(f"✅ Ingested {stats.chunks} chunks from {filename} ({stats.chunks_per_sec} chunks/sec)")
+    return asdict(stats)
+
+
+# --- Background Jobs ---
+JOB_OUTPUT_DIR = os.getenv("JOB_OUTPUT_DIR", "job_outputs")
+# Unfetched job audio (and every audiobook directory) is deleted after this long
+JOB_OUTPUT_TTL_SECONDS = float(os.getenv("JOB_OUTPUT_TTL_HOURS", "24")) * 3600
+
+
+def sweep_job_outputs() -> int:
+    """Delete job outputs older than JOB_OUTPUT_TTL_SECONDS; returns how many were removed."""
+    if not os.path.isdir(JOB_OUTPUT_DIR):
+        return 0
+    cutoff = time.time() - JOB_OUTPUT_TTL_SECONDS
+    removed = 0
+    for entry in os.scandir(JOB_OUTPUT_DIR):
+        try:
+            if entry.stat().st_mtime >= cutoff:
+                continue
+            if entry.is_dir():
+                shutil.rmtree(entry.path)
+            else:
+                os.remove(entry.path)
+            removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+def run_audio_job(payload: dict, report_progress) -> dict:
+    """Job handler: synthesise audio and keep it in JOB_OUTPUT_DIR until fetched (or expired)."""
+    sweep_job_outputs()
+    audio_path, fmt = tts.synthesize_audio_chunks(
+        chunks=[payload["text"]],
+        rate=payload["rate"],
+        voice_name=payload["voice"],
+        on_progress=report_progress,
+    )
+    os.makedirs(JOB_OUTPUT_DIR, exist_ok=True)
+    output_path = os.path.join(JOB_OUTPUT_DIR, f"{uuid.uuid4().hex}.{fmt}")
+    shutil.move(audio_path, output_path)
+    return {"audio_path": output_path, "format": fmt}
+
+
+def run_audiobook_job(payload: dict, report_progress) -> dict:
+    """Job handler: render per-chapter compressed files and a chapter manifest."""
+    sweep_job_outputs()
+    output_dir = os.path.join(JOB_OUTPUT_DIR, uuid.uuid4().hex)
+    manifest = chapters.render_audiobook(
+        payload["text"],
+        output_dir,
+        fmt=payload["format"],
+        bitrate=payload["bitrate"],
+        pages_per_chapter=payload["pages_per_chapter"],
+        rate=payload["rate"],
+        voice=payload["voice"],
+        on_progress=report_progress,
+    )
+    return {"output_dir": output_dir, **manifest}
+
+
+def run_ingest_job(payload: dict, report_progress) -> dict:
+    """Job handler: chunk, embed and store extracted text for chat."""
+    return ingest_text_to_chroma(payload["text"], payload["filename"])
+
+
+def run_enrich_job(payload: dict, report_progress) -> dict:
+    """Job handler: enrich text with Gemini."""
+    enriched_text = text_enrichment.enrich_text_with_gemini(
+        payload["text"], model_name=payload["model_name"]
+    )
+    return {"enriched_text": enriched_text}
+
+
+job_manager.register("generate-audio", run_audio_job)
+job_manager.register("generate-audiobook", run_audiobook_job)
+job_manager.register("enrich", run_enrich_job)
+job_manager.register("ingest", run_ingest_job, queue="ingest")
+
+
+# --- Startup ---
+@app.on_event("startup")
+def resume_jobs():
+    """Re-queue jobs that were pending when the server last stopped, and drop expired outputs."""
+    removed = sweep_job_outputs()
+    if removed:
+        print(f"🧹 Removed {removed} expired job output(s) from {JOB_OUTPUT_DIR}")
+    job_manager.resume_pending()
+
+
+@app.on_event("startup")
+def warm_up_tts_models():
+    """
+    Preload TTS models in the background so the first /generate-audio is fast.
+    TTS_WARMUP_MODELS is a comma-separated list; empty disables warm-up.
+    """
+    default = os.getenv("COQUI_MODEL", tts.DEFAULT_COQUI_MODEL) if tts.CoquiTTS is not None else ""
+    names = [n.strip() for n in os.getenv("TTS_WARMUP_MODELS", default).split(",") if n.strip()]
+    if names:
+        threading.Thread(target=model_registry.warm_up, args=(names,), daemon=True).start()
 
 
 # --- Endpoints ---
@@ -89,7 +187,7 @@ def health_check():
 
 
 @app.post("/extract")
-async def extract_text(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+async def extract_text(file: UploadFile = File(...)):
     """
     Extract text from uploaded document (PDF, DOCX, image, etc.)
     """
@@ -103,19 +201,29 @@ async def extract_text(background_tasks: BackgroundTasks, file: UploadFile = Fil
         if "🚫" in text or "📭" in text:
             raise HTTPException(status_code=400, detail=text)
 
-        # 2. Ingest to Vector DB (Background Task)
-        background_tasks.add_task(ingest_text_to_chroma, text, file.filename)
+        # 2. Ingest to Vector DB (background job, survives restarts)
+        ingest_job_id = job_manager.submit("ingest", {"text": text, "filename": file.filename})
 
         return {
             "filename": file.filename,
             "extracted_text": text,
             "message": "Text extracted successfully and stored for chat.",
+            "ingest_job_id": ingest_job_id,
+            "cache": extractor.get_cache_stats(),
         }
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/extract/cache")
+def extraction_cache_stats():
+    """
+    Report extraction cache hit/miss counters and disk usage
+    """
+    return extractor.get_cache_stats()
+
+
 @app.post("/enrich")
 async def enrich_text(request: EnrichRequest):
     """
@@ -124,22 +232,32 @@ async def enrich_text(request: EnrichRequest):
     if not os.getenv("GOOGLE_API_KEY"):
         raise HTTPException(status_code=500, detail="Server missing GOOGLE_API_KEY")
     try:
-        enriched_text = text_enrichment.enrich_text_with_gemini(
-            request.text, model_name=request.model_name
+        # Run off the event loop so other clients aren't stalled
+        enriched_text = await run_in_threadpool(
+            text_enrichment.enrich_text_with_gemini, request.text, model_name=request.model_name
         )
         return {"enriched_text": enriched_text}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/enrich/cache")
+def enrichment_cache_stats():
+    """
+    Report enrichment cache hit rate and disk usage
+    """
+    return text_enrichment.get_enrichment_cache_stats()
+
+
 @app.post("/generate-audio")
 async def generate_audio(request: TTSRequest, background_tasks: BackgroundTasks):
     """
     Convert text into audio (TTS)
     """
     try:
-        # ✅ Use the sync function from tts.py
-        audio_path, fmt = tts.synthesize_audio_chunks(
+        # ✅ Use the sync function from tts.py, off the event loop
+        audio_path, fmt = await run_in_threadpool(
+            tts.synthesize_audio_chunks,
             chunks=[request.text],
             rate=request.rate,
             voice_name=request.voice
@@ -150,7 +268,7 @@ async def generate_audio(request: TTSRequest, background_tasks: BackgroundTasks)
 
         return FileResponse(
             path=audio_path,
-            media_type=f"audio/{fmt}",
+            media_type=encoding.media_type(fmt),
             filename=f"audiobook.{fmt}",
         )
 
@@ -159,6 +277,204 @@ async def generate_audio(request: TTSRequest, background_tasks: BackgroundTasks)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/generate-audio/stream")
+async def generate_audio_stream(request: TTSRequest):
+    """
+    Convert text into audio, streaming audio bytes as they are synthesised
+    """
+    try:
+        fmt, audio_stream = await tts.open_audio_stream(
+            chunks=[request.text],
+            rate=request.rate,
+            voice_name=request.voice
+        )
+        # Pull the first frames before responding, so startup errors still return a 500
+        first = await audio_stream.__anext__()
+    except StopAsyncIteration:
+        raise HTTPException(status_code=500, detail="No audio generated")
+    except Exception as e:
+        print(f"TTS Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def body():
+        yield first
+        async for data in audio_stream:
+            yield data
+
+    return StreamingResponse(body(), media_type=encoding.media_type(fmt))
+
+
+@app.get("/generate-audio/cache")
+def generate_audio_cache_stats():
+    """
+    Report render cache hits and size (chunk audio reused across runs)
+    """
+    return get_render_cache_stats()
+
+
+@app.get("/generate-audio/metrics")
+def generate_audio_metrics():
+    """
+    Report time-to-first-audio for streamed synthesis
+    """
+    return tts.get_stream_metrics()
+
+
+@app.post("/jobs/generate-audio")
+def submit_audio_job(request: TTSRequest):
+    """
+    Queue text-to-speech as a background job; poll /jobs/{job_id} for progress
+    """
+    job_id = job_manager.submit("generate-audio", request.dict())
+    return {"job_id": job_id, "status": "queued"}
+
+
+@app.post("/jobs/generate-audiobook")
+def submit_audiobook_job(request: AudiobookRequest):
+    """
+    Queue a chaptered audiobook render (per-chapter files + chapter manifest)
+    """
+    if request.format not in encoding.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {request.format}")
+    job_id = job_manager.submit("generate-audiobook", request.dict())
+    return {"job_id": job_id, "status": "queued"}
+
+
+@app.post("/jobs/enrich")
+def submit_enrich_job(request: EnrichRequest):
+    """
+    Queue Gemini enrichment as a background job; poll /jobs/{job_id} for progress
+    """
+    if not os.getenv("GOOGLE_API_KEY"):
+        raise HTTPException(status_code=500, detail="Server missing GOOGLE_API_KEY")
+    job_id = job_manager.submit("enrich", request.dict())
+    return {"job_id": job_id, "status": "queued"}
+
+
+@app.get("/jobs")
+def list_jobs(limit: int = 50):
+    """
+    List recent jobs with their status
+    """
+    return {"jobs": job_manager.recent(limit)}
+
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    """
+    Report a job's status and progress
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "error": job["error"],
+    }
+
+
+@app.get("/jobs/{job_id}/result")
+def job_result(job_id: str, background_tasks: BackgroundTasks):
+    """
+    Fetch a finished job's result (the audio file, or the enriched text).
+    Job audio is deleted once it has been sent.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=job["error"])
+    if job["status"] != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+
+    result = job["result"]
+    if job["kind"] == "generate-audio":
+        if not os.path.exists(result["audio_path"]):
+            raise HTTPException(status_code=410, detail="Audio file no longer available")
+        background_tasks.add_task(os.remove, result["audio_path"])
+        return FileResponse(
+            path=result["audio_path"],
+            media_type=encoding.media_type(result["format"]),
+            filename=f"audiobook.{result['format']}",
+        )
+    return result
+
+
+@app.get("/jobs/{job_id}/files/{filename}")
+def job_file(job_id: str, filename: str):
+    """
+    Download one file of a finished audiobook job (a chapter or the book file)
+    """
+    job = job_manager.get(job_id)
+    if job is None or job["kind"] != "generate-audiobook" or job["status"] != "succeeded":
+        raise HTTPException(status_code=404, detail="Audiobook job not found or not finished")
+    result = job["result"]
+    # Only serve files listed in the manifest
+    allowed = {entry["file"] for entry in result["chapters"]} | {result["book_file"]}
+    path = os.path.join(result["output_dir"], filename)
+    if filename not in allowed or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="File not found")
+    return FileResponse(path=path, filename=filename)
+
+
+@app.get("/ingest/stats")
+def ingest_stats():
+    """
+    Report ingestion throughput (chunks/sec) of recent runs
+    """
+    return ingestion.get_ingestion_stats()
+
+
+@app.get("/embeddings/stats")
+def embeddings_stats():
+    """
+    Report embedding cache hit rate and inference throughput
+    """
+    return embedding_engine.stats()
+
+
+@app.get("/llm/stats")
+def llm_stats():
+    """
+    Report LLM call counts, retries and latency histograms per provider
+    """
+    return llm_clients.stats()
+
+
+@app.get("/tts/models")
+def tts_model_stats():
+    """
+    Report resident TTS models with load time and memory metrics
+    """
+    return model_registry.stats()
+
+
+@app.get("/chat/cache")
+def chat_cache_stats():
+    """
+    Report exact and semantic /chat cache hits, misses and invalidations
+    """
+    return query_cache.stats()
+
+
+def _chat_sources(chunks):
+    return [
+        {
+            "text": c.text[:200] + "...",
+            "source": c.metadata.get("source", "unknown"),
+            "score": c.distance,
+        }
+        for c in chunks
+    ]
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
 @app.post("/chat")
 async def chat_with_docs(request: ChatRequest):
     """
@@ -171,20 +487,46 @@ async def chat_with_docs(request: ChatRequest):
             collection_name=request.collection_name,
         )
 
-        sources = [
-            {
-                "text": c.text[:200] + "...",
-                "source": c.metadata.get("source", "unknown"),
-                "score": c.distance,
-            }
-            for c in chunks
-        ]
+        return {"answer": answer, "sources": _chat_sources(chunks)}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        return {"answer": answer, "sources": sources}
 
+@app.post("/chat/stream")
+async def chat_with_docs_stream(request: ChatRequest):
+    """
+    Query the extracted text using RAG, streaming server-sent events:
+    one "sources" event, then "token" events as the LLM writes, then "done"
+    """
+    try:
+        # Retrieval runs before the response starts, so its errors still return a 500
+        chunks, pieces = await run_in_threadpool(
+            rag_query.rag_answer_stream,
+            query=request.query,
+            top_k=request.top_k,
+            collection_name=request.collection_name,
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    def events():
+        yield _sse("sources", _chat_sources(chunks))
+        try:
+            for piece in pieces:
+                yield _sse("token", {"text": piece})
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+            return
+        yield _sse("done", {})
+
+    # A sync generator is iterated in the threadpool, so blocking SDK streams are fine
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
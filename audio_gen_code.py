@@ -1,53 +1,172 @@
-from TTS.api import TTS
+import io
 import os
 import soundfile as sf
 import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from tts_models import model_registry
+from chunking import chunk_by_sentences, split_text_by_limit  # noqa: F401 (re-exported)
+from audio_writer import open_audio_writer
+from render_cache import render_cache, render_key, write_manifest
+
+XTTS_MODEL = "tts_models/multilingual/multi-dataset/xtts_v2"
+SPEAKER = "Sofia Hellen"
+SAMPLE_RATE = 22050  # default sample rate
+# Each worker process holds its own XTTS replica (~2 GB RAM), so keep this modest
+XTTS_WORKERS = int(os.getenv("XTTS_WORKERS", "1"))
+# XTTS v2 warns (and degrades) above ~250 characters per input
+XTTS_CHUNK_CHARS = 250
+# "memmap" spools PCM to a memory-mapped file before writing the final WAV
+PCM_STORE = os.getenv("AUDIO_PCM_STORE", "")
+
+# ----------- Worker pool -----------
+def _init_worker(threads):
+    """Load this process's XTTS replica (once, via the registry), pinned to its share of the cores."""
+    import torch
+    torch.set_num_threads(threads)
+    model_registry.get(XTTS_MODEL)
+
+def _synthesize_chunk(job):
+    """Synthesise one (paragraph, sub-chunk) job with this process's model."""
+    i, j, sub_chunk, output_path, key = job
+    print(f"Generating chunk {i+1}.{j+1}")
+    with model_registry.using(XTTS_MODEL) as tts:
+        audio = tts.tts(text=sub_chunk, speaker=SPEAKER, language="en")
+    audio = np.asarray(audio, dtype=np.float32)
+    # Checkpoint right away, so a crash later in the book keeps this chunk
+    render_cache.set_bytes(key, _encode_chunk(audio))
+    if output_path:
+        sf.write(output_path, audio, SAMPLE_RATE)
+    return audio
+
+def _encode_chunk(audio):
+    buffer = io.BytesIO()
+    sf.write(buffer, audio, SAMPLE_RATE, format="WAV", subtype="FLOAT")
+    return buffer.getvalue()
+
+def _cached_chunk(key):
+    """Previously rendered audio for a chunk key, or None."""
+    data = render_cache.get_bytes(key)
+    if data is None:
+        return None
+    try:
+        audio, _ = sf.read(io.BytesIO(data), dtype="float32")
+        return audio
+    except Exception:
+        return None
 
-# ----------- Helper function -----------
-def split_text_by_limit(text, limit=250):
-    """Split text into sub-chunks that are <= limit characters, without breaking words if possible."""
-    words = text.split()
-    chunks, current = [], ""
-
-    for word in words:
-        if len(current) + len(word) + 1 <= limit:
-            current += (" " if current else "") + word
-        else:
-            chunks.append(current)
-            current = word
-    if current:
-        chunks.append(current)
-    return chunks
 #Function for audio extraction
-def generate_audio(text,output_file="final_audiobook.wav"):
-    tts = TTS("tts_models/multilingual/multi-dataset/xtts_v2", gpu=False)
-    # Specification of speaker
-    speaker_choice="Sofia Hellen"
+def generate_audio(text, output_file="final_audiobook.wav", workers=None, chunk_dir=None, resume=True,
+                   pcm_store=None):
+    """
+    Synthesise text with XTTS v2 and write one merged WAV file.
+
+    Sub-chunks form a work queue shared by `workers` processes, each with its
+    own model replica; results are reassembled in text order. Pass chunk_dir
+    (e.g. "xtts_output") to also keep every sub-chunk as its own WAV.
+
+    Every rendered sub-chunk is checkpointed in the render cache (see
+    render_cache.py). With resume=True, sub-chunks whose text, speaker and
+    model are unchanged are reused instead of re-synthesised, so a crashed
+    or edited book only renders what is missing.
+
+    Chunks are appended to output_file as soon as they are ready, in text
+    order, so memory stays flat however long the book is. pcm_store="memmap"
+    spools the PCM to a memory-mapped backing file instead and writes the
+    WAV from it at the end; see audio_writer.py.
+    """
+    workers = max(1, workers or XTTS_WORKERS)
+    settings = {"engine": "xtts", "model": XTTS_MODEL, "voice": SPEAKER,
+                "language": "en", "sample_rate": SAMPLE_RATE}
 
     # ----------- 5. Split into paragraphs -----------
     paragraphs = text.split("\n\n")   # main chunks
-    os.makedirs("xtts_output", exist_ok=True)
-    all_audio = []
-    samplerate = 22050  # default sample rate
-
-    # ----------- 6. Generate audio -----------
+    if chunk_dir:
+        os.makedirs(chunk_dir, exist_ok=True)
+    jobs = []
     for i, para in enumerate(paragraphs):
         if para.strip():
-        # Further split into <=250 char sub-chunks
-            sub_chunks = split_text_by_limit(para, limit=250)
-            for j, sub_chunk in enumerate(sub_chunks):
-                output_path = f"xtts_output/chunk_{i}_{j}.wav"
-                print("Generating chunk {i+1}.{j+1}/{len(paragraphs)}")
-                audio=tts.tts(text=sub_chunk, speaker=speaker_choice,language="en")
-                sf.write(output_path,audio,samplerate)
-                all_audio.append(audio)
-               
-
-
-# ----------- 7. Merge all into one file -----------
-    if all_audio:
-        merged_audio = np.concatenate(all_audio)
-        sf.write(output_file, merged_audio, samplerate)
-        print(f"✅ Final audiobook saved as {output_file}")
-    else:
+            # Further split into <=250 char sub-chunks on sentence boundaries
+            for j, sub_chunk in enumerate(chunk_by_sentences(para, XTTS_CHUNK_CHARS)):
+                output_path = os.path.join(chunk_dir, f"chunk_{i}_{j}.wav") if chunk_dir else None
+                jobs.append((i, j, sub_chunk, output_path, render_key(sub_chunk, **settings)))
+
+    # ----------- 6. Reuse finished chunks -----------
+    cached = {n for n, job in enumerate(jobs) if resume and render_cache.contains(job[4])}
+    pending = [n for n in range(len(jobs)) if n not in cached]
+    print(f"Generating {len(pending)} of {len(jobs)} chunks from {len(paragraphs)} paragraphs "
+          f"on {workers} worker(s) ({len(cached)} reused)")
+    if not jobs:
         print("⚠ No audio generated")
+        return
+
+    # ----------- 7. Generate audio and append it to the file in order -----------
+    reused = set()
+    with open_audio_writer(output_file, SAMPLE_RATE, pcm_store=pcm_store or PCM_STORE or None) as writer:
+        for n, audio, from_cache in _iter_chunk_audio(jobs, pending, workers):
+            if from_cache:
+                reused.add(n)
+                if jobs[n][3]:
+                    sf.write(jobs[n][3], audio, SAMPLE_RATE)
+            writer.write(audio)
+
+    write_manifest(output_file, settings, [
+        {"paragraph": i, "sub_chunk": j, "key": key, "chars": len(sub_chunk), "reused": n in reused}
+        for n, (i, j, sub_chunk, output_path, key) in enumerate(jobs)
+    ])
+    print(f"✅ Final audiobook saved as {output_file}")
+
+def _iter_chunk_audio(jobs, pending, workers):
+    """Yield (job index, audio, from_cache) in text order.
+
+    Chunks not in pending are read from the render cache; one evicted since
+    the resume check is rendered like a pending chunk, by the same worker(s).
+    At most 2 * workers rendered chunks are in flight, so memory stays
+    bounded even when the pool is faster than the writer.
+    """
+    pending_set = set(pending)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    if workers == 1:
+        loaded = False
+        for n in range(len(jobs)):
+            audio = None if n in pending_set else _cached_chunk(jobs[n][4])
+            if audio is not None:
+                yield n, audio, True
+                continue
+            if not loaded:
+                _init_worker(threads)
+                loaded = True
+            yield n, _synthesize_chunk(jobs[n]), False
+        return
+
+    pool = None
+
+    def submit(n):
+        # The pool (and its model replicas) starts with the first chunk to render
+        nonlocal pool
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(threads,))
+        return pool.submit(_synthesize_chunk, jobs[n])
+
+    try:
+        queue = iter(pending)
+        in_flight = deque((n, submit(n)) for n in islice(queue, workers * 2))
+        for n in range(len(jobs)):
+            if n not in pending_set:
+                audio = _cached_chunk(jobs[n][4])
+                if audio is not None:
+                    yield n, audio, True
+                else:
+                    # Evicted since the resume check: render it on the pool too
+                    yield n, submit(n).result(), False
+                continue
+            # Pending chunks are submitted and consumed in text order
+            submitted, future = in_flight.popleft()
+            for next_n in islice(queue, 1):
+                in_flight.append((next_n, submit(next_n)))
+            yield submitted, future.result(), False
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
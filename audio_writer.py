@@ -0,0 +1,142 @@
+"""
+Incremental audio writers
+
+Long books must not be held in memory as one array. These writers take
+audio chunk by chunk, in playback order, so peak memory is one chunk no
+matter how long the book is:
+
+- WavStreamWriter appends each chunk straight to an open soundfile.SoundFile
+- MemmapPCMWriter appends raw float32 PCM to a backing file and writes the
+  final file on close by reading that file through np.memmap, block by
+  block; this allows whole-book processing (peak normalisation) without
+  loading the book into RAM
+
+Both are context managers with write(samples) and a `frames` count. When
+the output path has a compressed extension (.mp3, .opus, .ogg, .m4a) the
+audio is piped through encoding.StreamEncoder instead of written as WAV,
+so the file is encoded while synthesis is still running.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Optional
+
+import numpy as np
+import soundfile as sf
+
+import encoding
+
+BLOCK_FRAMES = 1 << 20  # frames per block when copying out of the memmap
+
+
+class WavStreamWriter:
+    """Append chunks to an audio file as they arrive."""
+
+    def __init__(self, path: str, samplerate: int, channels: int = 1, subtype: Optional[str] = None):
+        self.path = path
+        self.frames = 0
+        self._file = sf.SoundFile(path, "w", samplerate=samplerate, channels=channels, subtype=subtype)
+
+    def write(self, samples) -> None:
+        samples = np.asarray(samples, dtype=np.float32)
+        self._file.write(samples)
+        self.frames += len(samples)
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MemmapPCMWriter:
+    """Spool chunks to a raw float32 file, then write the final file from a memmap.
+
+    normalize_peak (e.g. 0.95) scales the whole book so its loudest sample
+    hits that level. The backing file (<path>.pcm) is deleted on close
+    unless keep_pcm is set.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        samplerate: int,
+        subtype: Optional[str] = None,
+        normalize_peak: Optional[float] = None,
+        keep_pcm: bool = False,
+    ):
+        self.path = path
+        self.samplerate = samplerate
+        self.subtype = subtype
+        self.normalize_peak = normalize_peak
+        self.keep_pcm = keep_pcm
+        self.pcm_path = f"{path}.pcm"
+        self.frames = 0
+        self.peak = 0.0
+        self._pcm = open(self.pcm_path, "wb")
+
+    def write(self, samples) -> None:
+        samples = np.asarray(samples, dtype=np.float32)
+        if samples.size:
+            self.peak = max(self.peak, float(np.abs(samples).max()))
+        self._pcm.write(samples.tobytes())
+        self.frames += len(samples)
+
+    def close(self) -> None:
+        if self._pcm.closed:
+            return
+        self._pcm.close()
+        try:
+            gain = 1.0
+            if self.normalize_peak and self.peak > 0:
+                gain = self.normalize_peak / self.peak
+            with _open_output(self.path, self.samplerate, self.subtype) as out:
+                if self.frames:
+                    pcm = np.memmap(self.pcm_path, dtype=np.float32, mode="r", shape=(self.frames,))
+                    for start in range(0, self.frames, BLOCK_FRAMES):
+                        block = pcm[start:start + BLOCK_FRAMES]
+                        out.write(block * gain if gain != 1.0 else np.asarray(block))
+                    del pcm
+        finally:
+            if not self.keep_pcm:
+                os.remove(self.pcm_path)
+
+    def abort(self) -> None:
+        """Discard everything written so far."""
+        self._pcm.close()
+        if not self.keep_pcm and os.path.exists(self.pcm_path):
+            os.remove(self.pcm_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+
+def _open_output(path: str, samplerate: int, subtype: Optional[str] = None):
+    """StreamEncoder for compressed extensions, otherwise a WavStreamWriter."""
+    if encoding.format_for_path(path):
+        return encoding.StreamEncoder(path, samplerate)
+    return WavStreamWriter(path, samplerate, subtype=subtype)
+
+
+def open_audio_writer(path: str, samplerate: int, pcm_store: Optional[str] = None, **options):
+    """Incremental writer for path.
+
+    MemmapPCMWriter when pcm_store == "memmap"; otherwise StreamEncoder for
+    compressed extensions (encoder settings from AUDIO_BITRATE /
+    AUDIO_SAMPLE_RATE) and WavStreamWriter for everything else.
+    """
+    if pcm_store == "memmap":
+        return MemmapPCMWriter(path, samplerate, **options)
+    if encoding.format_for_path(path):
+        return encoding.StreamEncoder(path, samplerate, **options)
+    return WavStreamWriter(path, samplerate, **options)
@@ -0,0 +1,114 @@
+"""
+In-process BM25 keyword index
+
+Dense retrieval misses exact technical terms ("CloudTrail",
+"s3:PutObject"), so rag_query fuses it with this keyword index. One index
+is kept per Chroma collection (see VectorStore.keyword_index):
+
+- built lazily from the collection's documents on first use
+- updated incrementally by ingestion (add / remove by chunk id), so it
+  never needs a full rebuild while the process runs
+- an inverted index (term -> {doc id: term frequency}), so a search only
+  scores documents that share a term with the query
+
+Tokens are lower-cased alphanumeric runs; compound terms such as
+"s3:putobject" or "us-east-1" are indexed both whole and as their parts.
+"""
+
+from __future__ import annotations
+
+import re
+import math
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_COMPOUND = re.compile(r"[a-z0-9]+(?:[:\-_./][a-z0-9]+)*")
+_PART = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for term in _COMPOUND.findall(text.lower()):
+        tokens.append(term)
+        parts = _PART.findall(term)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over an incrementally maintained inverted index."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._documents: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def add(self, ids: Iterable[str], documents: Iterable[str], metadatas: Optional[Iterable[Dict[str, Any]]] = None) -> None:
+        """Index documents; an id that is already indexed is replaced."""
+        ids, documents = list(ids), list(documents)
+        metadatas = list(metadatas) if metadatas is not None else [{}] * len(ids)
+        with self._lock:
+            self.remove(ids)
+            for doc_id, text, metadata in zip(ids, documents, metadatas):
+                counts = Counter(tokenize(text))
+                for term, tf in counts.items():
+                    self._postings.setdefault(term, {})[doc_id] = tf
+                length = sum(counts.values())
+                self._lengths[doc_id] = length
+                self._total_length += length
+                self._documents[doc_id] = (text, metadata or {})
+
+    def remove(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            for doc_id in ids:
+                if doc_id not in self._lengths:
+                    continue
+                text, _ = self._documents.pop(doc_id)
+                for term in set(tokenize(text)):
+                    posting = self._postings.get(term)
+                    if posting is not None:
+                        posting.pop(doc_id, None)
+                        if not posting:
+                            del self._postings[term]
+                self._total_length -= self._lengths.pop(doc_id)
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Top-k (doc id, score) pairs, best first."""
+        with self._lock:
+            n = len(self._lengths)
+            if not n:
+                return []
+            avg_length = self._total_length / n
+            scores: Dict[str, float] = {}
+            for term in set(tokenize(query)):
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, tf in posting.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def document(self, doc_id: str) -> Tuple[str, Dict[str, Any]]:
+        """(text, metadata) of an indexed document."""
+        with self._lock:
+            return self._documents[doc_id]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists: score(id) = sum over lists of 1 / (k + rank)."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
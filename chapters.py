@@ -0,0 +1,241 @@
+"""
+Chapter-aware audiobook output
+
+Instead of one multi-GB WAV, a book is rendered as one compressed file per
+chapter plus a chapter manifest, and optionally a single book file with
+chapter markers (M4B for AAC, ID3 CHAP frames for MP3):
+
+- chapters follow the extractor's '--- Page N ---' markers: every
+  CHAPTER_PAGES pages (capped at CHAPTER_MAX_CHARS characters) form a
+  chapter, and paragraphs are never split; text without markers is packed
+  paragraph by paragraph up to CHAPTER_MAX_CHARS
+- chapters are synthesised one after another, and each finished chapter is
+  handed to a background pool (ENCODE_WORKERS ffmpeg processes) for
+  encoding while the next chapter is being synthesised; chapters that
+  already come out in the requested format (Edge-TTS MP3) are only
+  stream-copied
+- <output_dir>/chapters.json lists every chapter with its pages, file,
+  start offset and duration
+
+CLI usage:
+
+  python chapters.py "extracted_text/Mod2 - AWS-S3.txt" --out-dir book --format m4a
+"""
+
+from __future__ import annotations
+
+import os
+import json
+import time
+import shutil
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from chunking import chunk_sections, split_pages
+import encoding
+
+logger = logging.getLogger(__name__)
+
+CHAPTER_PAGES = int(os.getenv("CHAPTER_PAGES", "10"))
+CHAPTER_MAX_CHARS = int(os.getenv("CHAPTER_MAX_CHARS", "40000"))
+ENCODE_WORKERS = int(os.getenv("ENCODE_WORKERS", "2"))
+
+
+@dataclass
+class Chapter:
+    index: int
+    title: str
+    first_page: Optional[int]
+    last_page: Optional[int]
+    text: str
+
+
+def split_chapters(
+    text: str,
+    pages_per_chapter: int = CHAPTER_PAGES,
+    max_chars: int = CHAPTER_MAX_CHARS,
+) -> List[Chapter]:
+    """Group pages (or, without page markers, paragraphs) into chapters."""
+    pages = split_pages(text)
+    if not any(page is not None for page, _ in pages):
+        groups = [[(None, chunk.text)] for chunk in chunk_sections(text, max_chars)]
+    else:
+        groups, current, used = [], [], 0
+        for page, page_text in pages:
+            if current and (len(current) >= pages_per_chapter or used + len(page_text) > max_chars):
+                groups.append(current)
+                current, used = [], 0
+            current.append((page, page_text))
+            used += len(page_text)
+        if current:
+            groups.append(current)
+
+    chapters = []
+    for number, group in enumerate(groups, 1):
+        numbers = [page for page, _ in group if page is not None]
+        first, last = (min(numbers), max(numbers)) if numbers else (None, None)
+        title = f"Chapter {number}"
+        if first is not None:
+            title += f" (page {first})" if first == last else f" (pages {first}-{last})"
+        chapters.append(Chapter(number, title, first, last, "\n\n".join(t for _, t in group)))
+    return chapters
+
+
+def _synthesize_with_tts(rate: int, voice: str) -> Callable[[str, str], str]:
+    """Synthesiser using tts.synthesize_audio_chunks (Coqui, else Edge-TTS)."""
+    import tts
+
+    def synthesize(text: str, stem: str) -> str:
+        # Keep Coqui output lossless: it is encoded once, in the chapter format
+        path, fmt = tts.synthesize_audio_chunks([text], rate=rate, voice_name=voice, audio_format="wav")
+        output = f"{stem}.{fmt}"
+        shutil.move(path, output)
+        return output
+    return synthesize
+
+
+def _synthesize_with_xtts(text: str, stem: str) -> str:
+    """Synthesiser using audio_gen_code.generate_audio (XTTS v2 -> WAV)."""
+    import audio_gen_code
+    output = f"{stem}.wav"
+    audio_gen_code.generate_audio(text, output_file=output)
+    os.remove(f"{output}.manifest.json")
+    return output
+
+
+def render_audiobook(
+    text: str,
+    output_dir: str,
+    fmt: str = "mp3",
+    bitrate: str = "64k",
+    pages_per_chapter: int = CHAPTER_PAGES,
+    engine: str = "tts",
+    rate: int = 180,
+    voice: str = "",
+    single_file: bool = True,
+    title: str = "Audiobook",
+    on_progress: Optional[Callable[[float], None]] = None,
+    synthesize: Optional[Callable[[str, str], str]] = None,
+) -> Dict[str, Any]:
+    """
+    Render text as per-chapter compressed files plus chapters.json.
+
+    engine: "tts" (Coqui, else Edge-TTS) or "xtts" (XTTS v2). synthesize,
+    if given, replaces the engine: synthesize(text, path_stem) -> audio path.
+    Without ffmpeg the synthesised files are kept uncompressed and no
+    single book file is written. Returns the manifest.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    chapters = split_chapters(text, pages_per_chapter)
+    if synthesize is None:
+        synthesize = _synthesize_with_xtts if engine == "xtts" else _synthesize_with_tts(rate, voice)
+    can_encode = encoding.ffmpeg_available()
+    if not can_encode:
+        logger.warning("ffmpeg not found: keeping uncompressed chapter files")
+    extension = encoding.FORMATS[fmt][1]
+
+    def encode(chapter: Chapter, raw_path: str) -> Dict[str, Any]:
+        if not can_encode:
+            path = os.path.join(output_dir, f"chapter_{chapter.index:03d}{os.path.splitext(raw_path)[1]}")
+            os.replace(raw_path, path)
+            return {"file": os.path.basename(path), "path": path}
+        path = os.path.join(output_dir, f"chapter_{chapter.index:03d}.{extension}")
+        # Edge-TTS chapters already are MP3: stream-copy them rather than transcode
+        encoding.encode_file(raw_path, path, fmt=fmt, bitrate=bitrate, copy_if_same=True, metadata={
+            "title": chapter.title, "album": title, "track": f"{chapter.index}/{len(chapters)}",
+        })
+        os.remove(raw_path)
+        return {"file": os.path.basename(path), "path": path}
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, ENCODE_WORKERS), thread_name_prefix="encode") as pool:
+        futures = []
+        for done, chapter in enumerate(chapters, 1):
+            stem = os.path.join(output_dir, f"chapter_{chapter.index:03d}.raw")
+            raw_path = synthesize(chapter.text, stem)
+            # Encode in the background while the next chapter is synthesised
+            futures.append(pool.submit(encode, chapter, raw_path))
+            logger.info(f"Synthesised {chapter.title} ({done}/{len(chapters)})")
+            if on_progress:
+                on_progress(0.95 * done / len(chapters))
+        outputs = [future.result() for future in futures]
+
+    entries, offset = [], 0.0
+    for chapter, output in zip(chapters, outputs):
+        duration = encoding.probe_duration(output["path"]) if can_encode else None
+        entries.append({
+            "index": chapter.index,
+            "title": chapter.title,
+            "first_page": chapter.first_page,
+            "last_page": chapter.last_page,
+            "chars": len(chapter.text),
+            "file": output["file"],
+            "start_seconds": round(offset, 3) if duration is not None else None,
+            "duration_seconds": round(duration, 3) if duration is not None else None,
+        })
+        offset += duration or 0.0
+
+    book_file = None
+    if single_file and can_encode and entries:
+        book_file = f"book.{encoding.BOOK_EXTENSIONS[fmt]}"
+        encoding.join_with_chapters(
+            [output["path"] for output in outputs],
+            [entry["title"] for entry in entries],
+            [entry["duration_seconds"] for entry in entries],
+            os.path.join(output_dir, book_file),
+            album=title,
+            fmt=fmt,
+            bitrate=bitrate,
+        )
+
+    manifest = {
+        "title": title,
+        "format": fmt if can_encode else "uncompressed",
+        "bitrate": bitrate if can_encode else None,
+        "book_file": book_file,
+        "duration_seconds": round(offset, 3) if can_encode else None,
+        "render_seconds": round(time.perf_counter() - started, 1),
+        "chapters": entries,
+    }
+    with open(os.path.join(output_dir, "chapters.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    if on_progress:
+        on_progress(1.0)
+    return manifest
+
+
+def main():
+    import argparse
+    p = argparse.ArgumentParser(description="Render a text file as a chaptered audiobook")
+    p.add_argument("input_file", help="Path to an extracted (or enriched) .txt file")
+    p.add_argument("--out-dir", default="audiobook", help="Output directory")
+    p.add_argument("--format", choices=sorted(encoding.FORMATS), default="mp3", help="Chapter file format")
+    p.add_argument("--bitrate", default="64k", help="Encoder bitrate")
+    p.add_argument("--pages-per-chapter", type=int, default=CHAPTER_PAGES, help="Pages per chapter")
+    p.add_argument("--engine", choices=["tts", "xtts"], default="tts", help="Synthesis engine")
+    p.add_argument("--voice", default="", help="Edge-TTS voice")
+    p.add_argument("--rate", type=int, default=180, help="Speaking rate (words per minute)")
+    p.add_argument("--no-book-file", action="store_true", help="Only write per-chapter files")
+    args = p.parse_args()
+
+    with open(args.input_file, encoding="utf-8") as f:
+        text = f.read()
+    manifest = render_audiobook(
+        text,
+        args.out_dir,
+        fmt=args.format,
+        bitrate=args.bitrate,
+        pages_per_chapter=args.pages_per_chapter,
+        engine=args.engine,
+        rate=args.rate,
+        voice=args.voice,
+        single_file=not args.no_book_file,
+        title=os.path.splitext(os.path.basename(args.input_file))[0],
+    )
+    print(f"✅ {len(manifest['chapters'])} chapters written to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
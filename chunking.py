@@ -0,0 +1,302 @@
+"""
+Text chunking shared by ingestion, enrichment and TTS
+
+One module, several strategies, all linear in the input size:
+
+- split_sentences(text): sentence boundaries
+- split_text_by_limit(text, limit): word-boundary split into <= limit chars
+- chunk_by_sentences(text, max_chars): pack whole sentences up to max_chars
+- chunk_by_paragraphs(text, max_chars): the same, never across paragraphs
+- chunk_by_tokens(text, max_tokens): pack sentences up to a token budget
+- sliding_windows(text, window_tokens, overlap_tokens): overlapping windows
+- chunk_sections(text, max_chars, overlap_chars, page_breaks, stable_cuts):
+  pack paragraphs while respecting the extractor's '--- Page N ---' markers
+
+Benchmark on the bundled samples:
+
+  python chunking.py                      # all files in extracted_text/
+  python chunking.py some.txt --repeat 50
+"""
+
+from __future__ import annotations
+
+import re
+import hashlib
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional, Tuple
+
+PAGE_MARKER = re.compile(r"^--- Page (\d+) ---$", re.MULTILINE)
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+@dataclass
+class Chunk:
+    text: str
+    index: int
+    first_page: Optional[int] = None
+    last_page: Optional[int] = None
+    # Tail of the previous chunk, for callers that want overlap as context
+    context: str = ""
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap tokenizer-free token count (words and punctuation marks)."""
+    return len(_TOKEN.findall(text))
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split on sentence-ending punctuation and blank lines."""
+    sentences = []
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        sentences.extend(s.strip() for s in _SENTENCE_END.split(paragraph) if s.strip())
+    return sentences
+
+
+def split_text_by_limit(text: str, limit: int = 250) -> List[str]:
+    """Split text into sub-chunks that are <= limit characters, without breaking words if possible."""
+    chunks: List[str] = []
+    current: List[str] = []
+    current_len = 0  # length of " ".join(current)
+
+    for word in text.split():
+        if current and current_len + len(word) + 1 > limit:
+            chunks.append(" ".join(current))
+            current, current_len = [], 0
+        current_len += len(word) + (1 if current else 0)
+        current.append(word)
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def _pack(pieces: List[str], budget: int, size: Callable[[str], int], joiner: str = " ") -> List[str]:
+    """Greedily pack pieces into groups whose total size stays within budget."""
+    out: List[str] = []
+    current: List[str] = []
+    used = 0
+    sep = size(joiner) if joiner.strip() else len(joiner)
+    for piece in pieces:
+        piece_size = size(piece)
+        if current and used + sep + piece_size > budget:
+            out.append(joiner.join(current))
+            current, used = [], 0
+        used += piece_size + (sep if current else 0)
+        current.append(piece)
+    if current:
+        out.append(joiner.join(current))
+    return out
+
+
+def chunk_by_sentences(text: str, max_chars: int = 250) -> List[str]:
+    """Pack whole sentences into chunks of at most max_chars.
+
+    Sentences longer than max_chars are split on word boundaries.
+    """
+    pieces: List[str] = []
+    for sentence in split_sentences(text):
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+        else:
+            pieces.extend(split_text_by_limit(sentence, max_chars))
+    return _pack(pieces, max_chars, len)
+
+
+def chunk_by_paragraphs(text: str, max_chars: int = 250) -> List[str]:
+    """chunk_by_sentences applied to each paragraph ('\n\n'-separated) on its own.
+
+    Chunks never span paragraphs, so editing one paragraph leaves the
+    chunks of every other paragraph unchanged (stable render cache keys).
+    """
+    return [
+        chunk
+        for paragraph in text.split("\n\n") if paragraph.strip()
+        for chunk in chunk_by_sentences(paragraph, max_chars)
+    ]
+
+
+def chunk_by_tokens(
+    text: str,
+    max_tokens: int = 256,
+    count_tokens: Callable[[str], int] = estimate_tokens,
+) -> List[str]:
+    """Pack whole sentences into chunks of at most max_tokens tokens.
+
+    count_tokens defaults to a word/punctuation estimate; pass a real
+    tokenizer's counter for exact budgets.
+    """
+    pieces: List[str] = []
+    for sentence in split_sentences(text):
+        if count_tokens(sentence) <= max_tokens:
+            pieces.append(sentence)
+        else:
+            pieces.extend(_pack(sentence.split(), max_tokens, count_tokens))
+    return _pack(pieces, max_tokens, count_tokens)
+
+
+def sliding_windows(text: str, window_tokens: int = 200, overlap_tokens: int = 50) -> List[str]:
+    """Overlapping windows of window_tokens words, each sharing overlap_tokens with the previous."""
+    words = text.split()
+    if not words:
+        return []
+    step = max(1, window_tokens - overlap_tokens)
+    windows = []
+    for start in range(0, len(words), step):
+        windows.append(" ".join(words[start:start + window_tokens]))
+        if start + window_tokens >= len(words):
+            break
+    return windows
+
+
+def split_pages(text: str) -> List[Tuple[Optional[int], str]]:
+    """Split extractor output into (page_number, page_text) using '--- Page N ---' markers.
+
+    Text before the first marker (or text without markers) gets page None.
+    """
+    pages: List[Tuple[Optional[int], str]] = []
+    position, page = 0, None
+    for marker in PAGE_MARKER.finditer(text):
+        if text[position:marker.start()].strip():
+            pages.append((page, text[position:marker.start()].strip()))
+        position, page = marker.end(), int(marker.group(1))
+    if text[position:].strip():
+        pages.append((page, text[position:].strip()))
+    return pages
+
+
+def _sections(text: str, max_chars: int) -> Iterator[Tuple[Optional[int], str]]:
+    """Paragraphs (split further by sentences if too long), tagged with their page."""
+    for page, page_text in split_pages(text):
+        for paragraph in _PARAGRAPH_BREAK.split(page_text):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            if len(paragraph) <= max_chars:
+                yield page, paragraph
+            else:
+                for piece in chunk_by_sentences(paragraph, max_chars):
+                    yield page, piece
+
+
+def _tail(text: str, max_chars: int) -> str:
+    """Last ~max_chars of text, starting at a sentence or word boundary."""
+    if len(text) <= max_chars:
+        return text
+    tail = text[-max_chars:]
+    for separator in (". ", "\n", " "):
+        index = tail.find(separator)
+        if index != -1:
+            return tail[index + len(separator):]
+    return tail
+
+
+def _is_anchor(section: str, target_chars: int) -> bool:
+    """Content-defined cut point: true for a deterministic pseudo-random subset of sections.
+
+    The chance is proportional to the section's length, so on average one
+    anchor falls every target_chars characters.
+    """
+    value = int.from_bytes(hashlib.sha1(section.encode("utf-8")).digest()[:4], "big")
+    return value < min(1.0, len(section) / max(1, target_chars)) * 2 ** 32
+
+
+def chunk_sections(
+    text: str,
+    max_chars: int = 1000,
+    overlap_chars: int = 0,
+    page_breaks: bool = False,
+    stable_cuts: bool = False,
+) -> List[Chunk]:
+    """Pack paragraphs into chunks of at most max_chars, aware of page markers.
+
+    Page markers are removed from the chunk text and reported as
+    first_page/last_page. With page_breaks=True a chunk never spans two
+    pages. Each chunk's context holds the last ~overlap_chars of the
+    previous chunk.
+
+    Greedy packing moves every later boundary when text is inserted near
+    the start. With stable_cuts=True chunks also end after "anchor"
+    paragraphs chosen by content hash (once at least max_chars / 4 are
+    packed), so boundaries resynchronise right after an edit and only the
+    chunks around it change.
+    """
+    chunks: List[Chunk] = []
+    current: List[str] = []
+    used = 0
+    first_page = last_page = None
+    min_chars, target_chars = max_chars // 4, max_chars // 2
+
+    def flush():
+        chunks.append(Chunk("\n\n".join(current), len(chunks), first_page, last_page))
+
+    for page, section in _sections(text, max_chars):
+        new_page = page_breaks and current and page != last_page
+        if current and (new_page or used + 2 + len(section) > max_chars):
+            flush()
+            current, used = [], 0
+        if not current:
+            first_page = page
+        used += len(section) + (2 if current else 0)
+        current.append(section)
+        last_page = page
+        if stable_cuts and used >= min_chars and _is_anchor(section, target_chars):
+            flush()
+            current, used = [], 0
+    if current:
+        flush()
+
+    if overlap_chars > 0:
+        for previous, chunk in zip(chunks, chunks[1:]):
+            chunk.context = _tail(previous.text, overlap_chars)
+    return chunks
+
+
+# ----------- Benchmark -----------
+
+def _benchmark(paths: List[str], repeat: int) -> None:
+    import time
+
+    strategies = {
+        "split_text_by_limit(250)": lambda t: split_text_by_limit(t, 250),
+        "chunk_by_sentences(250)": lambda t: chunk_by_sentences(t, 250),
+        "chunk_by_paragraphs(3000)": lambda t: chunk_by_paragraphs(t, 3000),
+        "chunk_by_tokens(256)": lambda t: chunk_by_tokens(t, 256),
+        "sliding_windows(200/50)": lambda t: sliding_windows(t, 200, 50),
+        "chunk_sections(1000, pages)": lambda t: chunk_sections(t, 1000, page_breaks=True),
+        "chunk_sections(12000, 600)": lambda t: chunk_sections(t, 12000, 600),
+        "chunk_sections(12000, stable)": lambda t: chunk_sections(t, 12000, 600, stable_cuts=True),
+    }
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        print(f"\n{path} ({len(text):,} chars)")
+        print(f"  {'strategy':<30} {'chunks':>7} {'avg chars':>10} {'MB/s':>9}")
+        for name, fn in strategies.items():
+            started = time.perf_counter()
+            for _ in range(repeat):
+                result = fn(text)
+            seconds = (time.perf_counter() - started) / repeat
+            sizes = [len(c.text if isinstance(c, Chunk) else c) for c in result]
+            avg = sum(sizes) / len(sizes) if sizes else 0
+            mb_per_sec = len(text) / seconds / 1e6 if seconds else float("inf")
+            print(f"  {name:<30} {len(result):>7} {avg:>10.0f} {mb_per_sec:>9.1f}")
+
+
+def main():
+    import argparse
+    import glob
+    import os
+
+    p = argparse.ArgumentParser(description="Benchmark chunking strategies")
+    p.add_argument("files", nargs="*", help="Text files (default: extracted_text/*.txt)")
+    p.add_argument("--repeat", type=int, default=20, help="Runs per strategy")
+    args = p.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    paths = args.files or sorted(glob.glob(os.path.join(here, "extracted_text", "*.txt")))
+    _benchmark(paths, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
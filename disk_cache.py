@@ -0,0 +1,167 @@
+"""
+Disk Cache Module
+
+Size-bounded, on-disk LRU cache of text or bytes values keyed by hex
+digests. Shared by the extraction cache (text_extraction), the enrichment
+cache (text_enrichment) and the audio render cache (render_cache); it has
+no dependencies beyond the standard library, so importing it does not pull
+in any of those pipelines.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DiskCache:
+    """Size-bounded on-disk LRU cache of text (or bytes) values keyed by hex digests.
+
+    A file's mtime is its creation time (used for ``ttl_seconds`` expiry)
+    and its atime is its last use (used for LRU eviction).
+    """
+
+    def __init__(self, directory: str, max_bytes: int, ttl_seconds: Optional[float] = None,
+                 suffix: str = '.txt'):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self._lock = threading.Lock()
+        self._size_bytes: Optional[int] = None  # computed lazily from the directory
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}{self.suffix}")
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value for key, or None on a miss."""
+        data = self.get_bytes(key)
+        return data.decode('utf-8') if data is not None else None
+
+    def set(self, key: str, value: str) -> None:
+        """Store value under key, evicting old entries if the cache is full."""
+        self.set_bytes(key, value.encode('utf-8'))
+
+    def contains(self, key: str) -> bool:
+        """True if key has an unexpired entry (does not count as a hit or miss)."""
+        try:
+            created = os.stat(self._path(key)).st_mtime
+        except OSError:
+            return False
+        return self.ttl_seconds is None or time.time() - created <= self.ttl_seconds
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        """Return the cached bytes for key, or None on a miss."""
+        path = self._path(key)
+        try:
+            created = os.stat(path).st_mtime
+            now = time.time()
+            if self.ttl_seconds is not None and now - created > self.ttl_seconds:
+                self._remove(path)
+                with self._lock:
+                    self.expired += 1
+                raise FileNotFoundError(path)
+            with open(path, 'rb') as f:
+                value = f.read()
+            # Record the access in atime (eviction is LRU) and keep mtime as creation time
+            os.utime(path, (now, created))
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def set_bytes(self, key: str, data: bytes) -> None:
+        """Store bytes under key, evicting old entries if the cache is full."""
+        if len(data) > self.max_bytes:
+            logger.info(f"Not caching {len(data)} byte entry (limit {self.max_bytes})")
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            with self._lock:
+                size = self._current_size()
+                if os.path.exists(path):
+                    size -= os.path.getsize(path)
+                os.replace(tmp_path, path)
+                self._size_bytes = size + len(data)
+                if self._size_bytes > self.max_bytes:
+                    self._evict()
+        except OSError as e:
+            logger.warning(f"Cache write to {self.directory} failed: {e}")
+
+    def _remove(self, path: str) -> None:
+        with self._lock:
+            try:
+                size = os.path.getsize(path)
+                os.unlink(path)
+                if self._size_bytes is not None:
+                    self._size_bytes -= size
+            except OSError:
+                pass
+
+    def _entries(self):
+        try:
+            with os.scandir(self.directory) as it:
+                return [entry for entry in it if entry.name.endswith(self.suffix) and entry.is_file()]
+        except FileNotFoundError:
+            return []
+
+    def _current_size(self) -> int:
+        if self._size_bytes is None:
+            self._size_bytes = sum(entry.stat().st_size for entry in self._entries())
+        return self._size_bytes
+
+    def _evict(self) -> None:
+        """Remove least-recently-used entries until the cache fits in max_bytes."""
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_atime)
+        for entry in entries:
+            if self._size_bytes <= self.max_bytes:
+                break
+            try:
+                size = entry.stat().st_size
+                os.unlink(entry.path)
+                self._size_bytes -= size
+                logger.info(f"Evicted cache entry {entry.name}")
+            except OSError:
+                continue
+
+    def clear(self) -> None:
+        """Delete every cached entry and reset the counters."""
+        with self._lock:
+            for entry in self._entries():
+                try:
+                    os.unlink(entry.path)
+                except OSError:
+                    pass
+            self._size_bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.expired = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'expired': self.expired,
+                'entries': len(self._entries()),
+                'size_bytes': self._current_size(),
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                'directory': self.directory,
+            }
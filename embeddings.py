@@ -0,0 +1,248 @@
+"""
+Local embedding engine (all-MiniLM-L6-v2, ONNX on CPU)
+
+One process-wide engine serves every embedding call, so ingestion, /chat
+retrieval and the LangChain pipeline all produce identical 384-dim vectors:
+
+- the ONNX model and tokenizer are loaded once, on first use
+- texts are embedded in batches of EMBED_BATCH_SIZE, sorted by length so
+  each batch pads as little as possible
+- onnxruntime runs with EMBED_THREADS intra-op threads (default: all cores)
+- vectors are cached in an LRU keyed by the SHA-256 of the text, so repeated
+  queries and unchanged chunks are never re-embedded
+
+The model is the same ONNX export Chroma uses for its default embedder
+(downloaded to ~/.cache/chroma/onnx_models on first use), so collections
+built before this module existed stay compatible. onnxruntime and
+tokenizers are required (chromadb depends on both); set EMBED_MODEL_DIR to
+use a model directory of your own instead of Chroma's download.
+
+Environment variables:
+- EMBED_MODEL_DIR: directory with model.onnx and tokenizer.json (optional)
+- EMBED_THREADS: onnxruntime intra-op threads (default 0 = all cores)
+- EMBED_BATCH_SIZE: texts per inference batch (default 32)
+- EMBED_CACHE_SIZE: cached vectors (default 10000)
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    import onnxruntime as ort  # type: ignore
+    from tokenizers import Tokenizer  # type: ignore
+    HAS_ONNX = True
+except Exception:
+    np = None  # type: ignore
+    ort = None  # type: ignore
+    Tokenizer = None  # type: ignore
+    HAS_ONNX = False
+
+try:
+    from langchain_core.embeddings import Embeddings as _LangChainEmbeddings
+except Exception:
+    _LangChainEmbeddings = object  # type: ignore
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+MAX_TOKENS = 256  # MiniLM's training sequence length; longer input is truncated
+# Where Chroma's default embedder keeps its ONNX export
+CHROMA_MODEL_DIR = os.path.join(os.path.expanduser("~"), ".cache", "chroma", "onnx_models", MODEL_NAME, "onnx")
+# chromadb releases whose ONNXMiniLM_L6_V2 internals (DOWNLOAD_PATH,
+# EXTRACTED_FOLDER_NAME) are known to match what _chroma_model_dir() reads
+_CHROMA_INTERNALS_VERSIONS = ("0.4.", "0.5.", "0.6.", "1.")
+
+
+def _text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _has_model(model_dir: str) -> bool:
+    return all(os.path.exists(os.path.join(model_dir, name)) for name in ("model.onnx", "tokenizer.json"))
+
+
+def _chroma_model_dir() -> str:
+    """Download (once) and locate the ONNX export Chroma uses for its default embedder.
+
+    The download goes through Chroma's public embedding function. Its
+    private download path is only consulted, as a last resort, on chromadb
+    versions known to have it.
+    """
+    if _has_model(CHROMA_MODEL_DIR):
+        return CHROMA_MODEL_DIR
+    import chromadb
+    from chromadb.utils import embedding_functions
+    # Embedding one text makes Chroma download and extract the model
+    function = embedding_functions.DefaultEmbeddingFunction()
+    function(["warm up"])
+    if _has_model(CHROMA_MODEL_DIR):
+        return CHROMA_MODEL_DIR
+    if chromadb.__version__.startswith(_CHROMA_INTERNALS_VERSIONS):
+        download_path = getattr(function, "DOWNLOAD_PATH", None)
+        folder = getattr(function, "EXTRACTED_FOLDER_NAME", None)
+        if download_path and folder and _has_model(os.path.join(str(download_path), folder)):
+            return os.path.join(str(download_path), folder)
+    raise RuntimeError(
+        f"Could not locate Chroma's {MODEL_NAME} ONNX model (chromadb {chromadb.__version__}); "
+        "set EMBED_MODEL_DIR to a directory with model.onnx and tokenizer.json"
+    )
+
+
+class EmbeddingEngine:
+    """Batched, cached sentence embeddings from a single shared model."""
+
+    def __init__(
+        self,
+        model_dir: Optional[str] = None,
+        threads: int = 0,
+        batch_size: int = 32,
+        cache_size: int = 10000,
+    ):
+        self.model_dir = model_dir
+        self.threads = threads
+        self.batch_size = max(1, batch_size)
+        self.cache_size = cache_size
+        self._session = None
+        self._tokenizer = None
+        self._load_lock = threading.Lock()
+        # Sessions are thread-safe, but batching is cheaper than contending threads
+        self._infer_lock = threading.Lock()
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "batches": 0, "texts": 0, "seconds": 0.0}
+
+    # ----------- Model -----------
+
+    def _load(self) -> None:
+        if self._session is not None:
+            return
+        with self._load_lock:
+            if self._session is not None:
+                return
+            if not HAS_ONNX:
+                raise RuntimeError("Embeddings need onnxruntime and tokenizers: pip install onnxruntime tokenizers")
+            started = time.perf_counter()
+            model_dir = self.model_dir or _chroma_model_dir()
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = self.threads
+            options.inter_op_num_threads = 1
+            session = ort.InferenceSession(
+                os.path.join(model_dir, "model.onnx"),
+                sess_options=options,
+                providers=["CPUExecutionProvider"],
+            )
+            tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+            tokenizer.enable_truncation(max_length=MAX_TOKENS)
+            tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+            self._tokenizer = tokenizer
+            self._session = session
+            logger.info(f"Loaded {MODEL_NAME} embedder in {time.perf_counter() - started:.1f}s")
+
+    def _infer(self, texts: List[str]) -> List[List[float]]:
+        """Embed one batch (no caching)."""
+        encoded = self._tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+        feeds = {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "token_type_ids": np.zeros_like(input_ids),
+        }
+        token_embeddings = self._session.run(None, feeds)[0]
+        # Mean pooling over real tokens, then L2 normalisation (as sentence-transformers does)
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32).tolist()
+
+    # ----------- Public API -----------
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, serving repeats from the cache. Output order matches input."""
+        keys = [_text_key(t) for t in texts]
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        missing: Dict[str, List[int]] = {}
+        with self._cache_lock:
+            for i, key in enumerate(keys):
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    vectors[i] = cached
+                    self._stats["hits"] += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+                    self._stats["misses"] += 1
+
+        if missing:
+            self._load()
+            # Longest first, so texts of similar length share a batch and padding stays small
+            order = sorted(missing, key=lambda k: len(texts[missing[k][0]]), reverse=True)
+            for start in range(0, len(order), self.batch_size):
+                batch_keys = order[start:start + self.batch_size]
+                batch = [texts[missing[k][0]] for k in batch_keys]
+                started = time.perf_counter()
+                with self._infer_lock:
+                    batch_vectors = self._infer(batch)
+                seconds = time.perf_counter() - started
+                with self._cache_lock:
+                    self._stats["batches"] += 1
+                    self._stats["texts"] += len(batch)
+                    self._stats["seconds"] += seconds
+                    for key, vector in zip(batch_keys, batch_vectors):
+                        for i in missing[key]:
+                            vectors[i] = vector
+                        self._cache[key] = vector
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+        return vectors  # type: ignore[return-value]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed([text])[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cache_lock:
+            stats = dict(self._stats)
+            cached = len(self._cache)
+        lookups = stats["hits"] + stats["misses"]
+        return {
+            "model": MODEL_NAME,
+            "backend": "onnxruntime" if self._session is not None else "not loaded",
+            "threads": self.threads,
+            "batch_size": self.batch_size,
+            "cache_entries": cached,
+            "cache_size": self.cache_size,
+            "hits": stats["hits"],
+            "misses": stats["misses"],
+            "hit_rate": stats["hits"] / lookups if lookups else 0.0,
+            "batches": stats["batches"],
+            "texts_per_sec": round(stats["texts"] / stats["seconds"], 1) if stats["seconds"] else 0.0,
+        }
+
+
+class LangChainEmbeddings(_LangChainEmbeddings):
+    """LangChain Embeddings backed by the shared engine."""
+
+    def __init__(self, engine: Optional[EmbeddingEngine] = None):
+        self.engine = engine or embedding_engine
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.engine.embed(list(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.engine.embed_query(text)
+
+
+embedding_engine = EmbeddingEngine(
+    model_dir=os.getenv("EMBED_MODEL_DIR") or None,
+    threads=int(os.getenv("EMBED_THREADS", "0")),
+    batch_size=int(os.getenv("EMBED_BATCH_SIZE", "32")),
+    cache_size=int(os.getenv("EMBED_CACHE_SIZE", "10000")),
+)
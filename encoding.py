@@ -0,0 +1,370 @@
+"""
+Compressed audio encoding with ffmpeg
+
+Synthesis produces PCM; books are delivered compressed (Opus/OGG/MP3 are
+roughly a tenth of the bytes of WAV). This module wraps the ffmpeg CLI:
+
+- StreamEncoder: pipe PCM into ffmpeg while synthesis is still producing
+  it, so the compressed file is ready as soon as the last chunk is
+- encode_file(): one input file -> MP3 / Opus / Vorbis / AAC (m4a)
+- join_with_chapters(): stitch chapter files into one book (M4B or MP3)
+  with chapter markers, re-encoding only if the chapters' streams differ
+- probe_duration() / probe_stream(): length and stream parameters of an
+  audio file via ffprobe
+
+ffmpeg is an external binary (FFMPEG_BINARY / FFPROBE_BINARY, default
+found on PATH); callers should check ffmpeg_available() and keep
+uncompressed output when it is missing.
+
+Environment variables:
+- AUDIO_FORMAT: format for synthesised audio, "wav" disables encoding
+  (default mp3)
+- AUDIO_BITRATE: encoder bitrate (default 48k)
+- AUDIO_SAMPLE_RATE: output sample rate in Hz, 0 keeps the source rate
+  (default 0)
+
+Benchmark encoding throughput:
+
+  python encoding.py --seconds 300
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import shutil
+import functools
+import tempfile
+import subprocess
+from typing import Dict, List, Optional, Sequence
+
+FFMPEG = os.getenv("FFMPEG_BINARY", "ffmpeg")
+FFPROBE = os.getenv("FFPROBE_BINARY", "ffprobe")
+
+# format -> (ffmpeg codec arguments, file extension, media type)
+FORMATS: Dict[str, tuple] = {
+    "mp3": (["-c:a", "libmp3lame"], "mp3", "audio/mpeg"),
+    "opus": (["-c:a", "libopus", "-application", "voip"], "opus", "audio/ogg"),
+    "ogg": (["-c:a", "libvorbis"], "ogg", "audio/ogg"),
+    "m4a": (["-c:a", "aac"], "m4a", "audio/mp4"),
+}
+# Single-file book container for each chapter format
+BOOK_EXTENSIONS = {"mp3": "mp3", "opus": "opus", "ogg": "ogg", "m4a": "m4b"}
+
+AUDIO_FORMAT = os.getenv("AUDIO_FORMAT", "mp3").lower()
+AUDIO_BITRATE = os.getenv("AUDIO_BITRATE", "48k")
+AUDIO_SAMPLE_RATE = int(os.getenv("AUDIO_SAMPLE_RATE", "0"))
+
+
+class EncodingError(Exception):
+    pass
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which(FFMPEG) is not None
+
+
+def media_type(fmt: str) -> str:
+    """HTTP media type for an audio format name (wav, mp3, opus, ...)."""
+    return FORMATS[fmt][2] if fmt in FORMATS else f"audio/{fmt}"
+
+
+@functools.lru_cache(maxsize=None)
+def _ffmpeg_encoders() -> frozenset:
+    """Names of the audio encoders this ffmpeg build has."""
+    try:
+        output = _run([FFMPEG, "-hide_banner", "-encoders"]).stdout.decode("utf-8", "replace")
+    except EncodingError:
+        return frozenset()
+    return frozenset(line.split()[1] for line in output.splitlines()
+                     if len(line.split()) > 1 and line.split()[0].startswith("A"))
+
+
+def encoder_available(fmt: str) -> bool:
+    """True if ffmpeg is installed and built with the encoder fmt needs (e.g. libopus)."""
+    if fmt not in FORMATS or not ffmpeg_available():
+        return False
+    codec_args = FORMATS[fmt][0]
+    return codec_args[codec_args.index("-c:a") + 1] in _ffmpeg_encoders()
+
+
+def output_format(fmt: Optional[str] = None) -> Optional[str]:
+    """The compressed format to produce (fmt or AUDIO_FORMAT), or None for WAV.
+
+    None as well when ffmpeg is not installed or lacks the format's encoder.
+    """
+    fmt = (fmt or AUDIO_FORMAT).lower()
+    if not encoder_available(fmt):
+        return None
+    return fmt
+
+
+def format_for_path(path: str) -> Optional[str]:
+    """Compressed format implied by a file extension (.mp3, .opus, ...), if any."""
+    extension = os.path.splitext(path)[1].lstrip(".").lower()
+    for fmt, (_, ext, _) in FORMATS.items():
+        if ext == extension:
+            return fmt
+    return None
+
+
+class StreamEncoder:
+    """Encode float PCM to a compressed file while it is being produced.
+
+    PCM is piped to an ffmpeg process as it is written, so encoding runs in
+    parallel with synthesis. Same interface as the writers in
+    audio_writer.py: write(samples), close(), `frames`, context manager.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        samplerate: int,
+        fmt: Optional[str] = None,
+        bitrate: Optional[str] = None,
+        output_rate: Optional[int] = None,
+        channels: int = 1,
+    ):
+        self.path = path
+        self.fmt = fmt or format_for_path(path) or AUDIO_FORMAT
+        if self.fmt not in FORMATS:
+            raise EncodingError(f"Unsupported format: {self.fmt}")
+        self.frames = 0
+        output_rate = output_rate if output_rate is not None else AUDIO_SAMPLE_RATE
+        rate_args = ["-ar", str(output_rate)] if output_rate else []
+        self._stderr = tempfile.TemporaryFile()
+        try:
+            self._process = subprocess.Popen(
+                [FFMPEG, "-nostdin", "-y", "-loglevel", "error",
+                 "-f", "f32le", "-ar", str(samplerate), "-ac", str(channels), "-i", "pipe:0",
+                 *FORMATS[self.fmt][0], "-b:a", bitrate or AUDIO_BITRATE, *rate_args, path],
+                stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self._stderr,
+            )
+        except FileNotFoundError:
+            self._stderr.close()
+            raise EncodingError(f"{FFMPEG} not found. Install ffmpeg or set FFMPEG_BINARY.")
+
+    def write(self, samples) -> None:
+        import numpy as np
+        samples = np.asarray(samples, dtype="<f4")
+        try:
+            self._process.stdin.write(samples.tobytes())
+        except BrokenPipeError:
+            self._process.wait()
+            raise EncodingError(f"ffmpeg exited early: {self._error()}")
+        self.frames += len(samples)
+
+    def _error(self) -> str:
+        self._stderr.seek(0)
+        return self._stderr.read().decode("utf-8", "replace").strip()
+
+    def close(self) -> None:
+        if self._process.stdin.closed:
+            return
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+        code = self._process.wait()
+        error = self._error()
+        self._stderr.close()
+        if code != 0:
+            raise EncodingError(f"ffmpeg failed: {error}")
+
+    def abort(self) -> None:
+        """Stop encoding and delete the partial output."""
+        self._process.kill()
+        self._process.wait()
+        self._stderr.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+
+def _run(args: Sequence[str]) -> subprocess.CompletedProcess:
+    try:
+        return subprocess.run(list(args), check=True, capture_output=True)
+    except FileNotFoundError:
+        raise EncodingError(f"{args[0]} not found. Install ffmpeg or set FFMPEG_BINARY.")
+    except subprocess.CalledProcessError as e:
+        raise EncodingError(f"{args[0]} failed: {e.stderr.decode('utf-8', 'replace').strip()}")
+
+
+def encode_file(
+    src: str,
+    dst: str,
+    fmt: str = "mp3",
+    bitrate: str = "64k",
+    metadata: Optional[Dict[str, str]] = None,
+    copy_if_same: bool = False,
+) -> str:
+    """Encode src (any format ffmpeg reads) to dst in the given format.
+
+    With copy_if_same, a src that is already in fmt (by extension, e.g.
+    Edge-TTS MP3 to mp3) is stream-copied with the new metadata instead of
+    being transcoded lossy-to-lossy; bitrate is then ignored.
+    """
+    if fmt not in FORMATS:
+        raise EncodingError(f"Unsupported format: {fmt}")
+    codec_args = FORMATS[fmt][0] + ["-b:a", bitrate]
+    if copy_if_same and format_for_path(src) == fmt:
+        codec_args = ["-c:a", "copy"]
+    meta_args: List[str] = []
+    for key, value in (metadata or {}).items():
+        meta_args += ["-metadata", f"{key}={value}"]
+    _run([FFMPEG, "-nostdin", "-y", "-loglevel", "error", "-i", src, "-vn",
+          *codec_args, *meta_args, dst])
+    return dst
+
+
+def probe_duration(path: str) -> float:
+    """Duration in seconds."""
+    result = _run([FFPROBE, "-v", "error", "-show_entries", "format=duration",
+                   "-of", "default=noprint_wrappers=1:nokey=1", path])
+    return float(result.stdout.decode().strip() or 0.0)
+
+
+def probe_stream(path: str) -> tuple:
+    """(codec name, sample rate, channel count) of the first audio stream."""
+    result = _run([FFPROBE, "-v", "error", "-select_streams", "a:0",
+                   "-show_entries", "stream=codec_name,sample_rate,channels",
+                   "-of", "default=noprint_wrappers=1", path])
+    fields = dict(line.split("=", 1) for line in result.stdout.decode().splitlines() if "=" in line)
+    return fields.get("codec_name"), int(fields.get("sample_rate") or 0), int(fields.get("channels") or 0)
+
+
+def _escape_metadata(value: str) -> str:
+    for char in ("\\", "=", ";", "#", "\n"):
+        value = value.replace(char, "\\" + char)
+    return value
+
+
+def join_with_chapters(files: List[str], titles: List[str], durations: List[float], dst: str,
+                       album: str = "", fmt: Optional[str] = None, bitrate: Optional[str] = None) -> str:
+    """Concatenate chapter files into dst, with one chapter marker per file.
+
+    Streams are copied when every chapter has the same codec, sample rate
+    and channel count. Otherwise (e.g. Edge-TTS MP3 chapters next to
+    re-encoded Coqui ones) the chapters are resampled to a common rate and
+    layout and re-encoded as fmt (default: implied by dst) at bitrate.
+    MP3 output gets ID3v2 CHAP frames, .m4b output gets MP4 chapters.
+    """
+    streams = {probe_stream(path) for path in files}
+    with tempfile.TemporaryDirectory() as tmp:
+        if len(streams) == 1:
+            list_path = os.path.join(tmp, "files.txt")
+            with open(list_path, "w", encoding="utf-8") as f:
+                for path in files:
+                    escaped = os.path.abspath(path).replace("'", "'\\''")
+                    f.write(f"file '{escaped}'\n")
+            inputs = ["-f", "concat", "-safe", "0", "-i", list_path]
+            audio_args = ["-map", "0:a", "-c", "copy"]
+        else:
+            fmt = fmt or format_for_path(dst) or ("m4a" if dst.endswith(".m4b") else AUDIO_FORMAT)
+            if fmt not in FORMATS:
+                raise EncodingError(f"Unsupported format: {fmt}")
+            rate = max(rate for _, rate, _ in streams)
+            layout = "stereo" if max(channels for _, _, channels in streams) > 1 else "mono"
+            inputs = [arg for path in files for arg in ("-i", path)]
+            graph = "".join(f"[{n}:a]aresample={rate},aformat=channel_layouts={layout}[a{n}];"
+                            for n in range(len(files)))
+            graph += "".join(f"[a{n}]" for n in range(len(files))) + f"concat=n={len(files)}:v=0:a=1[out]"
+            audio_args = ["-filter_complex", graph, "-map", "[out]",
+                          *FORMATS[fmt][0], "-b:a", bitrate or AUDIO_BITRATE]
+
+        meta_path = os.path.join(tmp, "chapters.txt")
+        with open(meta_path, "w", encoding="utf-8") as f:
+            f.write(";FFMETADATA1\n")
+            if album:
+                f.write(f"title={_escape_metadata(album)}\n")
+            start = 0
+            for title, duration in zip(titles, durations):
+                end = start + int(round(duration * 1000))
+                f.write(f"[CHAPTER]\nTIMEBASE=1/1000\nSTART={start}\nEND={end}\n")
+                f.write(f"title={_escape_metadata(title)}\n")
+                start = end
+
+        # The chapter metadata is the input after the audio input(s)
+        meta_index = str(1 if len(streams) == 1 else len(files))
+        extra = ["-id3v2_version", "3"] if dst.endswith(".mp3") else []
+        _run([FFMPEG, "-nostdin", "-y", "-loglevel", "error", *inputs, "-i", meta_path,
+              *audio_args, "-map_metadata", meta_index, "-map_chapters", meta_index, *extra, dst])
+    return dst
+
+
+# ----------- Benchmark -----------
+
+def _speech_like(seconds: float, samplerate: int):
+    """Deterministic test signal: syllable-rate modulated harmonics plus noise."""
+    import numpy as np
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * samplerate)) / samplerate
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.3 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / samplerate
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 8))
+    envelope = 0.5 * (1 + np.sin(2 * np.pi * 4 * t)) * (np.sin(2 * np.pi * 0.2 * t) > -0.6)
+    return (0.3 * voiced * envelope + 0.01 * rng.standard_normal(len(t))).astype("float32")
+
+
+def benchmark(seconds: float = 120.0, samplerate: int = 22050, chunk_seconds: float = 5.0,
+              bitrates: Sequence[str] = ("32k", "48k", "64k")) -> List[Dict[str, object]]:
+    """Encode a test signal with every format and bitrate, in synthesis-sized chunks."""
+    audio = _speech_like(seconds, samplerate)
+    chunk = int(chunk_seconds * samplerate)
+    wav_bytes = len(audio) * 2 + 44  # 16-bit PCM WAV
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt, (_, extension, _) in FORMATS.items():
+            for bitrate in bitrates:
+                path = os.path.join(tmp, f"bench_{bitrate}.{extension}")
+                started = time.perf_counter()
+                try:
+                    with StreamEncoder(path, samplerate, fmt=fmt, bitrate=bitrate) as encoder:
+                        for start in range(0, len(audio), chunk):
+                            encoder.write(audio[start:start + chunk])
+                except EncodingError as e:
+                    results.append({"format": fmt, "bitrate": bitrate, "error": str(e)})
+                    continue
+                elapsed = time.perf_counter() - started
+                size = os.path.getsize(path)
+                results.append({
+                    "format": fmt,
+                    "bitrate": bitrate,
+                    "seconds": round(elapsed, 3),
+                    "realtime_factor": round(seconds / elapsed, 1),
+                    "bytes": size,
+                    "ratio_vs_wav": round(wav_bytes / size, 1),
+                })
+    return results
+
+
+def main():
+    import argparse
+    p = argparse.ArgumentParser(description="Benchmark compressed audio encoding throughput")
+    p.add_argument("--seconds", type=float, default=120.0, help="Length of the test signal")
+    p.add_argument("--sample-rate", type=int, default=22050, help="Source sample rate")
+    p.add_argument("--bitrates", default="32k,48k,64k", help="Comma-separated bitrates")
+    args = p.parse_args()
+
+    if not ffmpeg_available():
+        print(f"❌ {FFMPEG} not found")
+        return
+    print(f"{'format':<6} {'bitrate':>7} {'seconds':>8} {'x realtime':>11} {'size':>10} {'vs WAV':>7}")
+    for r in benchmark(args.seconds, args.sample_rate, bitrates=args.bitrates.split(",")):
+        if "error" in r:
+            print(f"{r['format']:<6} {r['bitrate']:>7}  ⚠ {r['error']}")
+            continue
+        print(f"{r['format']:<6} {r['bitrate']:>7} {r['seconds']:>8} {r['realtime_factor']:>11} "
+              f"{r['bytes']:>10,} {r['ratio_vs_wav']:>6}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,5 @@
 /* eslint-disable no-unused-vars */
 import React, { useState } from "react";
-import axios from "axios";
 import toast from "react-hot-toast";
 
 const API_BASE = "http://localhost:8000";
@@ -22,13 +21,37 @@ export default function ChatTab() {
     setSources([]);
 
     try {
-      const res = await axios.post(`${API_BASE}/chat`, {
-        query,
-        top_k: 5,
+      // Server-sent events: "sources" first, then "token" pieces, then "done"
+      const res = await fetch(`${API_BASE}/chat/stream`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ query, top_k: 5 }),
       });
+      if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
 
-      setAnswer(res.data.answer || "No answer returned.");
-      setSources(res.data.sources || []);
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let received = "";
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split("\n\n");
+        buffer = events.pop();
+        for (const raw of events) {
+          const event = raw.match(/^event: (.*)$/m)?.[1];
+          const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || "{}");
+          if (event === "sources") setSources(data);
+          if (event === "token") {
+            received += data.text;
+            setAnswer(received);
+          }
+          if (event === "error") throw new Error(data.detail);
+        }
+      }
+
+      if (!received) setAnswer("No answer returned.");
       toast.success("Answer retrieved!");
     } catch (err) {
       console.error(err);
@@ -0,0 +1,197 @@
+"""
+Vector DB ingestion pipeline
+
+Turns extracted text into chunks in ChromaDB so RAG can find it:
+
+- chunk ids are content hashes of (source, chunk text), so re-ingesting the
+  same file is an idempotent upsert instead of a pile of duplicates
+- embeddings are computed in batches (INGEST_BATCH_SIZE) *outside* the
+  vector store write lock; only the fast upsert holds it, so /chat queries
+  keep running during ingestion
+- replace=True makes ingestion a source-level replace: chunks of the same
+  source that are no longer in the text are deleted
+- the collection's BM25 keyword index (rag_query hybrid retrieval) is
+  updated in place with every upsert and delete
+- every run records throughput in chunks/sec (see get_ingestion_stats())
+
+CLI usage:
+
+  python ingestion.py "extracted_text/Mod2 - AWS-S3.txt" --source "Mod2 - AWS-S3.pdf"
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional
+
+import rag_query
+from chunking import Chunk, chunk_sections
+from embeddings import embedding_engine
+from query_cache import query_cache
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+CHUNK_CHARS = int(os.getenv("INGEST_CHUNK_CHARS", "1000"))
+MIN_CHUNK_CHARS = 50
+
+_recent_runs: deque = deque(maxlen=20)
+_recent_lock = threading.Lock()
+
+
+@dataclass
+class IngestStats:
+    source: str
+    collection: str
+    chunks: int
+    batches: int
+    removed: int
+    seconds: float
+    chunks_per_sec: float
+
+
+def chunk_id(source: str, text: str) -> str:
+    """Deterministic id for a chunk of a given source."""
+    digest = hashlib.sha256(f"{source}\0{text}".encode("utf-8")).hexdigest()[:24]
+    return f"{source}_{digest}"
+
+
+def split_chunks(text: str, max_chars: int = CHUNK_CHARS) -> List[Chunk]:
+    """Paragraph-packed chunks that never span two pages, longer than MIN_CHUNK_CHARS."""
+    return [c for c in chunk_sections(text, max_chars, page_breaks=True) if len(c.text) > MIN_CHUNK_CHARS]
+
+
+def _embed(texts: List[str]) -> List[List[float]]:
+    """Embed with the shared engine that also embeds /chat queries."""
+    return embedding_engine.embed(texts)
+
+
+def ingest_text(
+    text: str,
+    source: str,
+    collection_name: str = "audiobook_embeddings",
+    db_dir: str = "./vectordb",
+    batch_size: int = BATCH_SIZE,
+    replace: bool = True,
+) -> IngestStats:
+    """Chunk, embed in batches and upsert text into ChromaDB."""
+    started = time.perf_counter()
+    store = rag_query.get_vector_store(db_dir)
+    collection = store.collection(collection_name, create=True)
+
+    # Identical chunks map to the same id; keep the first occurrence
+    chunks: Dict[str, Chunk] = {}
+    for chunk in split_chunks(text):
+        chunks.setdefault(chunk_id(source, chunk.text), chunk)
+    ids = list(chunks)
+    batch_size = max(1, batch_size)
+
+    batches = 0
+    for start in range(0, len(ids), batch_size):
+        batch_ids = ids[start:start + batch_size]
+        documents = [chunks[i].text for i in batch_ids]
+        embeddings = _embed(documents)
+        metadatas = []
+        for offset, i in enumerate(batch_ids):
+            metadata = {"source": source, "index": start + offset}
+            # Chroma metadata values cannot be None
+            if chunks[i].first_page is not None:
+                metadata["page"] = chunks[i].first_page
+            metadatas.append(metadata)
+        with store.write():
+            collection.upsert(ids=batch_ids, documents=documents, embeddings=embeddings, metadatas=metadatas)
+            # An index that is not built yet will read these chunks from Chroma when it is
+            index = store.keyword_index(collection_name, build=False)
+            if index is not None:
+                index.add(batch_ids, documents, metadatas)
+        batches += 1
+
+    removed = delete_source(source, collection_name, db_dir, keep_ids=set(ids)) if replace else 0
+    # Cached /chat answers may now be missing (or citing) chunks
+    query_cache.invalidate(collection_name, db_dir)
+
+    seconds = time.perf_counter() - started
+    stats = IngestStats(
+        source=source,
+        collection=collection_name,
+        chunks=len(ids),
+        batches=batches,
+        removed=removed,
+        seconds=round(seconds, 3),
+        chunks_per_sec=round(len(ids) / seconds, 1) if seconds > 0 else 0.0,
+    )
+    with _recent_lock:
+        _recent_runs.append(stats)
+    logger.info(
+        f"Ingested {stats.chunks} chunks from {source} in {stats.batches} batches "
+        f"({stats.chunks_per_sec} chunks/sec, {stats.removed} stale removed)"
+    )
+    return stats
+
+
+def delete_source(
+    source: str,
+    collection_name: str = "audiobook_embeddings",
+    db_dir: str = "./vectordb",
+    keep_ids: Optional[set] = None,
+) -> int:
+    """Delete every chunk of a source (except keep_ids). Returns the number removed."""
+    store = rag_query.get_vector_store(db_dir)
+    collection = store.collection(collection_name, create=True)
+    with store.write():
+        existing = collection.get(where={"source": source}, include=[])["ids"]
+        stale = [i for i in existing if not keep_ids or i not in keep_ids]
+        if stale:
+            collection.delete(ids=stale)
+            index = store.keyword_index(collection_name, build=False)
+            if index is not None:
+                index.remove(stale)
+    if stale:
+        query_cache.invalidate(collection_name, db_dir)
+    return len(stale)
+
+
+def get_ingestion_stats() -> Dict[str, Any]:
+    """Throughput of recent ingestion runs."""
+    with _recent_lock:
+        runs = [asdict(run) for run in _recent_runs]
+    total_chunks = sum(run["chunks"] for run in runs)
+    total_seconds = sum(run["seconds"] for run in runs)
+    return {
+        "recent_runs": runs,
+        "chunks_per_sec": round(total_chunks / total_seconds, 1) if total_seconds else 0.0,
+    }
+
+
+def main():
+    import argparse
+    p = argparse.ArgumentParser(description="Ingest a text file into ChromaDB")
+    p.add_argument("input_file", help="Path to an extracted .txt file")
+    p.add_argument("--source", help="Source name stored in metadata (default: file name)")
+    p.add_argument("--collection", default="audiobook_embeddings", help="Chroma collection name")
+    p.add_argument("--db-dir", default="./vectordb", help="Chroma persistence directory")
+    p.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Chunks embedded per batch")
+    p.add_argument("--append", action="store_true", help="Keep chunks of this source that are no longer in the text")
+    args = p.parse_args()
+
+    with open(args.input_file, encoding="utf-8") as f:
+        text = f.read()
+    stats = ingest_text(
+        text,
+        source=args.source or os.path.basename(args.input_file),
+        collection_name=args.collection,
+        db_dir=args.db_dir,
+        batch_size=args.batch_size,
+        replace=not args.append,
+    )
+    print(f"✅ Ingested {stats.chunks} chunks ({stats.chunks_per_sec} chunks/sec, {stats.removed} stale removed)")
+
+
+if __name__ == "__main__":
+    main()
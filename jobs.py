@@ -0,0 +1,178 @@
+"""
+Background job queue for long-running API work
+
+Synthesis and Gemini enrichment can take minutes, so the API can hand them
+to this queue instead of running them inside the request handler:
+
+- submit() stores the job in SQLite and returns its id immediately
+- a bounded thread pool (JOB_WORKERS, default 2) runs the jobs; kinds
+  registered on their own queue (e.g. "ingest", INGEST_WORKERS, default 1)
+  get a separate pool, so short jobs never wait behind book renders
+- handlers report progress (0.0-1.0) while they run
+- get() returns status, progress, result and error for a job id
+
+Jobs live in a local SQLite table (JOBS_DB, default ./jobs.sqlite3). On
+startup resume_pending() re-queues jobs that were queued or running when
+the process stopped, so a restart does not lose work.
+"""
+
+from __future__ import annotations
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# handler(payload, progress_callback) -> JSON-serialisable result
+JobHandler = Callable[[Dict[str, Any], Callable[[float], None]], Dict[str, Any]]
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+class JobManager:
+    """SQLite-backed job queue executed by a bounded thread pool."""
+
+    def __init__(self, db_path: str = "jobs.sqlite3", max_workers: int = 2):
+        self.db_path = db_path
+        self._handlers: Dict[str, JobHandler] = {}
+        self._pools: Dict[str, ThreadPoolExecutor] = {}
+        self._queues: Dict[str, str] = {}  # job kind -> queue name
+        self.add_queue("default", max_workers)
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a connection that commits on success and is always closed."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _update(self, job_id: str, **fields: Any) -> None:
+        fields["updated_at"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def add_queue(self, name: str, max_workers: int) -> None:
+        """Create a named queue with its own thread pool."""
+        self._pools[name] = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix=f"job-{name}")
+
+    def register(self, kind: str, handler: JobHandler, queue: str = "default") -> None:
+        """Register the function that runs jobs of the given kind, and the queue they run on."""
+        if queue not in self._pools:
+            raise ValueError(f"Unknown job queue: {queue}")
+        self._handlers[kind] = handler
+        self._queues[kind] = queue
+
+    def _enqueue(self, job_id: str, kind: str) -> None:
+        self._pools[self._queues.get(kind, "default")].submit(self._run, job_id)
+
+    def submit(self, kind: str, payload: Dict[str, Any]) -> str:
+        """Persist a new job and queue it. Returns the job id."""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, progress, payload, created_at, updated_at) "
+                "VALUES (?, ?, ?, 0, ?, ?, ?)",
+                (job_id, kind, QUEUED, json.dumps(payload), now, now),
+            )
+        self._enqueue(job_id, kind)
+        return job_id
+
+    def _run(self, job_id: str) -> None:
+        # Claim the job atomically so it never runs twice
+        with self._lock, self._connect() as conn:
+            claimed = conn.execute(
+                "UPDATE jobs SET status = ?, progress = 0, updated_at = ? WHERE id = ? AND status = ?",
+                (RUNNING, time.time(), job_id, QUEUED),
+            ).rowcount
+        if not claimed:
+            return
+        job = self.get(job_id)
+
+        def report(progress: float) -> None:
+            self._update(job_id, progress=max(0.0, min(1.0, float(progress))))
+
+        try:
+            result = self._handlers[job["kind"]](job["payload"], report)
+            self._update(job_id, status=SUCCEEDED, progress=1.0, result=json.dumps(result))
+        except Exception as e:
+            logger.error(f"Job {job_id} ({job['kind']}) failed: {e}")
+            self._update(job_id, status=FAILED, error=str(e))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the job as a dict, or None if it does not exist."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent jobs first, without payloads."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, kind, status, progress, error, created_at, updated_at "
+                "FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def resume_pending(self) -> int:
+        """Re-queue jobs left queued or running by a previous process."""
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, kind FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+            ).fetchall()
+            conn.execute("UPDATE jobs SET status = ?, progress = 0 WHERE status = ?", (QUEUED, RUNNING))
+        for row in rows:
+            self._enqueue(row["id"], row["kind"])
+        if rows:
+            logger.info(f"Resumed {len(rows)} pending jobs")
+        return len(rows)
+
+    def shutdown(self) -> None:
+        for pool in self._pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+job_manager = JobManager(
+    db_path=os.getenv("JOBS_DB", "jobs.sqlite3"),
+    max_workers=int(os.getenv("JOB_WORKERS", "2")),
+)
+# Ingestion gets its own queue: an upload is searchable in chat within
+# seconds even while JOB_WORKERS book renders are running
+job_manager.add_queue("ingest", int(os.getenv("INGEST_WORKERS", "1")))
@@ -0,0 +1,190 @@
+"""
+Shared LLM provider clients
+
+Keeps one long-lived client per (provider, model) instead of reconfiguring
+the SDK and building a new client for every /chat or /enrich request:
+
+- Gemini: genai.configure() runs once per API key; GenerativeModel objects
+  are cached per model name and share the SDK's transport
+- OpenAI: a single OpenAI client whose HTTP connection pool is reused
+
+All provider calls should go through ``llm_clients.call(provider, fn, ...)``,
+which bounds concurrency per provider, retries rate-limit (429) and
+transient (connection, timeout, 5xx) errors with exponential backoff and
+jitter, and records a latency histogram per provider (see stats()).
+
+Environment variables:
+- LLM_MAX_CONCURRENCY: max in-flight calls per provider (default 8)
+- LLM_MAX_RETRIES: retries after a 429 or transient error (default 4)
+- LLM_BACKOFF_SECONDS: initial backoff, doubled per retry (default 1.0)
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import random
+import bisect
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import google.generativeai as genai
+except Exception:
+    genai = None
+
+try:
+    from openai import OpenAI  # type: ignore
+except Exception:
+    OpenAI = None  # type: ignore
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS = [0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0]
+
+
+def is_rate_limit_error(e: Exception) -> bool:
+    """True for provider 429 / quota-exhausted errors, across SDKs."""
+    if type(e).__name__ in ("RateLimitError", "ResourceExhausted", "TooManyRequests"):
+        return True
+    message = str(e)
+    return "429" in message or "RESOURCE_EXHAUSTED" in message or "Too Many Requests" in message
+
+
+# Exception types (by name, across SDKs) for failures worth retrying
+_TRANSIENT_ERRORS = {
+    "APIConnectionError", "APITimeoutError", "InternalServerError",      # openai
+    "ServiceUnavailable", "DeadlineExceeded", "BadGateway", "GatewayTimeout",  # google.api_core
+}
+
+
+def is_transient_error(e: Exception) -> bool:
+    """True for connection errors, timeouts and 5xx responses, across SDKs."""
+    if isinstance(e, (ConnectionError, TimeoutError)) or type(e).__name__ in _TRANSIENT_ERRORS:
+        return True
+    status = getattr(e, "status_code", None) or getattr(e, "code", None)
+    return isinstance(status, int) and 500 <= status < 600
+
+
+class _ProviderStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_seconds = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def observe(self, seconds: float) -> None:
+        self.calls += 1
+        self.total_seconds += seconds
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        labels = [f"<={b}s" for b in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1]}s"]
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "avg_seconds": self.total_seconds / self.calls if self.calls else 0.0,
+            "latency_histogram": dict(zip(labels, self.buckets)),
+        }
+
+
+class LLMClientManager:
+    """Process-wide cache of provider clients with bounded, retried calls."""
+
+    def __init__(self, max_concurrency: int = 8, max_retries: int = 4, backoff_seconds: float = 1.0):
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self._max_concurrency = max(1, max_concurrency)
+        self._lock = threading.Lock()
+        self._gemini_key: Optional[str] = None
+        self._gemini_models: Dict[Tuple[str, str], Any] = {}
+        self._openai: Dict[str, Any] = {}
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._stats: Dict[str, _ProviderStats] = {}
+
+    # ----------- Clients -----------
+
+    def gemini_model(self, model_name: str, api_key: Optional[str] = None):
+        """Return a cached GenerativeModel, or None if Gemini is unavailable."""
+        if genai is None:
+            return None
+        api_key = api_key or os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            return None
+        with self._lock:
+            # genai.configure() is global to the SDK, so only redo it when the key changes
+            if self._gemini_key != api_key:
+                genai.configure(api_key=api_key)
+                self._gemini_key = api_key
+            model = self._gemini_models.get((api_key, model_name))
+            if model is None:
+                model = self._gemini_models[(api_key, model_name)] = genai.GenerativeModel(model_name)
+            return model
+
+    def openai_client(self, api_key: Optional[str] = None):
+        """Return the shared OpenAI client, or None if OpenAI is unavailable."""
+        if OpenAI is None:
+            return None
+        api_key = api_key or os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            return None
+        with self._lock:
+            client = self._openai.get(api_key)
+            if client is None:
+                # Retries (429s, connection errors, 5xx) are handled by call(), so the
+                # SDK's own retry loop is disabled
+                client = self._openai[api_key] = OpenAI(api_key=api_key, max_retries=0)
+            return client
+
+    # ----------- Calls -----------
+
+    def _provider(self, provider: str) -> Tuple[threading.BoundedSemaphore, _ProviderStats]:
+        with self._lock:
+            if provider not in self._semaphores:
+                self._semaphores[provider] = threading.BoundedSemaphore(self._max_concurrency)
+                self._stats[provider] = _ProviderStats()
+            return self._semaphores[provider], self._stats[provider]
+
+    def call(self, provider: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Call fn under the provider's concurrency limit, retrying 429s and transient errors with backoff."""
+        semaphore, stats = self._provider(provider)
+        attempt = 0
+        while True:
+            with semaphore:
+                started = time.perf_counter()
+                try:
+                    result = fn(*args, **kwargs)
+                    with self._lock:
+                        stats.observe(time.perf_counter() - started)
+                    return result
+                except Exception as e:
+                    with self._lock:
+                        stats.observe(time.perf_counter() - started)
+                        stats.errors += 1
+                    rate_limited, error = is_rate_limit_error(e), e
+                    if not (rate_limited or is_transient_error(e)) or attempt >= self.max_retries:
+                        raise
+            # Back off outside the semaphore so other callers can proceed
+            delay = self.backoff_seconds * (2 ** attempt) * (0.5 + random.random())
+            attempt += 1
+            with self._lock:
+                stats.retries += 1
+            reason = "rate limited" if rate_limited else f"transient error ({error})"
+            logger.warning(f"{provider} {reason}, retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-provider call counts, retries and latency histograms."""
+        with self._lock:
+            return {provider: stats.as_dict() for provider, stats in self._stats.items()}
+
+
+llm_clients = LLMClientManager(
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", "4")),
+    backoff_seconds=float(os.getenv("LLM_BACKOFF_SECONDS", "1.0")),
+)
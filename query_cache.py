@@ -0,0 +1,185 @@
+"""
+Two-level answer cache for RAG queries (/chat)
+
+The same questions come in over and over, and each one would otherwise
+repeat the query embedding, the HNSW search and an LLM call:
+
+1. exact: an LRU keyed by (normalised query, top_k, collection, provider);
+   normalisation lower-cases, collapses whitespace and drops trailing
+   punctuation, so "What is S3 versioning?" and "what is s3  versioning"
+   share an entry
+2. semantic: if there is no exact hit, the query embedding is compared
+   (cosine similarity) with the embeddings of cached queries for the same
+   top_k/collection/provider; a match above CHAT_SEMANTIC_THRESHOLD reuses
+   that answer
+
+Entries expire after CHAT_CACHE_TTL seconds. Ingesting into (or deleting
+from) a collection invalidates every entry for it; a per-collection
+generation counter keeps answers computed during an ingestion from being
+stored afterwards.
+
+Environment variables:
+- CHAT_CACHE_SIZE: max cached answers (default 256, 0 disables the cache)
+- CHAT_CACHE_TTL: seconds an answer stays valid (default 3600)
+- CHAT_SEMANTIC_THRESHOLD: min cosine similarity for a semantic hit
+  (default 0.95, 1.0 or more disables the semantic level)
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import math
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+_PUNCTUATION_TAIL = re.compile(r"[\s?.!]+$")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    return _PUNCTUATION_TAIL.sub("", _WHITESPACE.sub(" ", query.strip().lower()))
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+@dataclass
+class _Entry:
+    answer: str
+    chunks: List[Any]
+    embedding: Optional[List[float]]
+    created: float
+
+
+class QueryCache:
+    """Exact + semantic LRU of RAG answers, invalidated per collection."""
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 3600, threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._entries: "OrderedDict[Tuple, _Entry]" = OrderedDict()
+        self._generations: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        self._stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "invalidations": 0}
+
+    @staticmethod
+    def _scope(collection: str, db_dir: str) -> Tuple[str, str]:
+        return os.path.abspath(db_dir), collection
+
+    def _key(self, query: str, top_k: int, collection: str, db_dir: str, provider: str) -> Tuple:
+        return (*self._scope(collection, db_dir), top_k, provider, normalize_query(query))
+
+    def _expired(self, entry: _Entry) -> bool:
+        return self.ttl_seconds is not None and time.time() - entry.created > self.ttl_seconds
+
+    def generation(self, collection: str, db_dir: str) -> int:
+        """Current generation of a collection; pass it back to put()."""
+        with self._lock:
+            return self._generations.get(self._scope(collection, db_dir), 0)
+
+    def get(self, query: str, top_k: int, collection: str, db_dir: str, provider: str) -> Optional[_Entry]:
+        """Exact-match lookup on the normalised query."""
+        if self.max_entries <= 0:
+            return None
+        key = self._key(query, top_k, collection, db_dir, provider)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry):
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats["exact_hits"] += 1
+            return entry
+
+    def get_similar(
+        self, embedding: List[float], top_k: int, collection: str, db_dir: str, provider: str
+    ) -> Optional[_Entry]:
+        """Most similar cached query above the threshold, or None (counted as a miss)."""
+        if self.max_entries <= 0:
+            return None
+        prefix = (*self._scope(collection, db_dir), top_k, provider)
+        best_key, best_score = None, self.threshold
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if key[:4] != prefix or entry.embedding is None:
+                    continue
+                if self._expired(entry):
+                    del self._entries[key]
+                    continue
+                score = _cosine(embedding, entry.embedding)
+                if score >= best_score:
+                    best_key, best_score = key, score
+            if best_key is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self._stats["semantic_hits"] += 1
+            return self._entries[best_key]
+
+    def put(
+        self,
+        query: str,
+        top_k: int,
+        collection: str,
+        db_dir: str,
+        provider: str,
+        answer: str,
+        chunks: List[Any],
+        embedding: Optional[List[float]],
+        generation: int,
+    ) -> None:
+        """Store an answer, unless the collection changed since `generation` was read."""
+        if self.max_entries <= 0:
+            return
+        key = self._key(query, top_k, collection, db_dir, provider)
+        with self._lock:
+            if self._generations.get(self._scope(collection, db_dir), 0) != generation:
+                return
+            self._entries[key] = _Entry(answer, list(chunks), embedding, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, collection: str, db_dir: str) -> None:
+        """Drop every answer for a collection (call after it is written to)."""
+        scope = self._scope(collection, db_dir)
+        with self._lock:
+            self._generations[scope] = self._generations.get(scope, 0) + 1
+            for key in [k for k in self._entries if k[:2] == scope]:
+                del self._entries[key]
+            self._stats["invalidations"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            entries = len(self._entries)
+        lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+        hits = stats["exact_hits"] + stats["semantic_hits"]
+        return {
+            **stats,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "semantic_threshold": self.threshold,
+        }
+
+
+query_cache = QueryCache(
+    max_entries=int(os.getenv("CHAT_CACHE_SIZE", "256")),
+    ttl_seconds=float(os.getenv("CHAT_CACHE_TTL", "3600")),
+    threshold=float(os.getenv("CHAT_SEMANTIC_THRESHOLD", "0.95")),
+)
@@ -19,13 +19,14 @@ load_dotenv()
 
 # LangChain imports
 from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.documents import Document
 
+from embeddings import LangChainEmbeddings
+
 # Logging
 import logging
 logging.basicConfig(level=logging.INFO)
@@ -37,20 +38,17 @@ def get_vectorstore(
     persist_directory: str = "./vectordb"
 ) -> Chroma:
     """
-    Load existing ChromaDB vector store with HuggingFace embeddings (all-MiniLM-L6-v2).
-    Uses local embeddings - no API calls needed.
+    Load existing ChromaDB vector store with local all-MiniLM-L6-v2 embeddings.
+    Uses the shared embedding engine (loaded once per process), so vectors
+    match the ones written by ingestion.py - no API calls needed.
     """
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2"
-    )
-    
     vectorstore = Chroma(
         collection_name=collection_name,
-        embedding_function=embeddings,
+        embedding_function=LangChainEmbeddings(),
         persist_directory=persist_directory
     )
     
-    logger.info(f"Loaded vector store with HuggingFace embeddings: {collection_name}")
+    logger.info(f"Loaded vector store with shared MiniLM embeddings: {collection_name}")
     return vectorstore
 
 
@@ -20,9 +20,12 @@ from __future__ import annotations
 
 import os
 import sys
+import time
 import textwrap
+import threading
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import List, Tuple, Optional, Literal, Dict, Any
+from typing import List, Tuple, Optional, Literal, Dict, Any, Iterator
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -45,6 +48,11 @@ except Exception:
     OpenAI = None  # type: ignore
 
 
+from bm25 import BM25Index, reciprocal_rank_fusion
+from embeddings import embedding_engine
+from llm_clients import llm_clients
+from query_cache import query_cache
+
 # ChromaDB
 try:
     import chromadb
@@ -56,16 +64,18 @@ except Exception:
 
 Provider = Literal["auto", "gemini", "openai"]
 
+# Hybrid retrieval: fuse dense and BM25 rankings of top_k * RAG_HYBRID_CANDIDATES candidates each
+HYBRID_RETRIEVAL = os.getenv("RAG_HYBRID", "true").lower() in ("1", "true", "yes")
+HYBRID_CANDIDATES = int(os.getenv("RAG_HYBRID_CANDIDATES", "4"))
+RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+
 
 def _gemini_client(model_name: str = "gemini-2.5-flash"):
     if not HAS_GEMINI:
         return None
-    api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        return None
     try:
-        genai.configure(api_key=api_key)
-        return genai.GenerativeModel(model_name)
+        # Shared, long-lived model instance (see llm_clients)
+        return llm_clients.gemini_model(model_name)
     except Exception as e:
         logger.error(f"Failed to init Gemini: {e}")
         return None
@@ -74,22 +84,140 @@ def _gemini_client(model_name: str = "gemini-2.5-flash"):
 def _openai_client():
     if OpenAI is None:
         return None
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        return None
     try:
-        client = OpenAI(api_key=api_key)
-        return client
+        return llm_clients.openai_client()
     except Exception as e:
         logger.error(f"Failed to init OpenAI: {e}")
         return None
 
 
+class _ReadWriteLock:
+    """Many concurrent readers or one writer; waiting writers block new readers."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class VectorStore:
+    """Application-scoped ChromaDB client with cached collection handles.
+
+    The PersistentClient (SQLite + HNSW index) is opened once per directory
+    and shared by every request. Queries run under read(), ingestion under
+    write(), so background ingestion never races a /chat query. Each
+    collection also gets an in-memory BM25 index for hybrid retrieval.
+    """
+
+    def __init__(self, db_dir: str):
+        self.db_dir = db_dir
+        self._client = None
+        self._collections: Dict[str, Any] = {}
+        self._keyword_indexes: Dict[str, BM25Index] = {}
+        self._lock = threading.RLock()  # collection() opens the client under the same lock
+        self._rw = _ReadWriteLock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    if not HAS_CHROMA:
+                        raise RuntimeError("chromadb not installed. pip install chromadb")
+                    self._client = chromadb.PersistentClient(path=self.db_dir)
+        return self._client
+
+    def collection(self, name: str, create: bool = False):
+        """Return a cached collection handle, optionally creating the collection."""
+        col = self._collections.get(name)
+        if col is None:
+            with self._lock:
+                col = self._collections.get(name)
+                if col is None:
+                    if create:
+                        col = self.client.get_or_create_collection(name=name)
+                    else:
+                        col = self.client.get_collection(name=name)
+                    self._collections[name] = col
+        return col
+
+    def keyword_index(self, name: str, build: bool = True) -> Optional[BM25Index]:
+        """BM25 index of a collection, built from its documents on first use.
+
+        Build under read() (or write()) so the snapshot is consistent; with
+        build=False only an already-built index is returned (or None).
+        """
+        index = self._keyword_indexes.get(name)
+        if index is None and build:
+            with self._lock:
+                index = self._keyword_indexes.get(name)
+                if index is None:
+                    index = BM25Index()
+                    data = self.collection(name).get(include=["documents", "metadatas"])
+                    index.add(data["ids"], data["documents"], data["metadatas"])
+                    self._keyword_indexes[name] = index
+                    logger.info(f"Built BM25 index for {name} ({len(index)} chunks)")
+        return index
+
+    def forget(self, name: str) -> None:
+        """Drop a cached handle (e.g. after the collection was deleted)."""
+        with self._lock:
+            self._collections.pop(name, None)
+            self._keyword_indexes.pop(name, None)
+
+    def read(self):
+        return self._rw.read()
+
+    def write(self):
+        return self._rw.write()
+
+
+_stores: Dict[str, VectorStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_vector_store(db_dir: str = "./vectordb") -> VectorStore:
+    """Return the process-wide VectorStore for a persistence directory."""
+    key = os.path.abspath(db_dir)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = VectorStore(db_dir)
+        return store
+
+
 def get_collection(collection_name: str = "audiobook_embeddings", db_dir: str = "./vectordb"):
-    if not HAS_CHROMA:
-        raise RuntimeError("chromadb not installed. pip install chromadb")
-    client = chromadb.PersistentClient(path=db_dir)
-    return client.get_collection(name=collection_name)
+    return get_vector_store(db_dir).collection(collection_name)
 
 
 @dataclass
@@ -104,19 +232,56 @@ def retrieve_top_k(
     top_k: int = 5,
     collection_name: str = "audiobook_embeddings",
     db_dir: str = "./vectordb",
+    hybrid: Optional[bool] = None,
 ) -> List[RetrievedChunk]:
     """Retrieve top-k similar chunks from ChromaDB using query text.
 
-    Relies on Chroma's internal ONNX embedder for the query (matches 384-dim).
+    The query is embedded by the shared engine that embedded the chunks
+    (see embeddings.py), so query and document vectors always match.
+
+    With hybrid retrieval (RAG_HYBRID, on by default) the dense candidates
+    are fused with BM25 keyword candidates using reciprocal rank fusion, so
+    exact terms like "s3:PutObject" are found without a larger top_k.
     """
-    col = get_collection(collection_name, db_dir)
-    res = col.query(query_texts=[query], n_results=top_k)
+    hybrid = HYBRID_RETRIEVAL if hybrid is None else hybrid
+    candidates = max(top_k, top_k * HYBRID_CANDIDATES) if hybrid else top_k
+    query_embedding = embedding_engine.embed_query(query)
+    store = get_vector_store(db_dir)
+    col = store.collection(collection_name)
+    with store.read():
+        res = col.query(query_embeddings=[query_embedding], n_results=candidates)
+        keyword_hits = store.keyword_index(collection_name).search(query, candidates) if hybrid else []
+    ids = res.get("ids", [[]])[0]
     docs = res.get("documents", [[]])[0]
     dists = res.get("distances", [[]])[0]
     metas = res.get("metadatas", [[]])[0]
-    out: List[RetrievedChunk] = []
-    for t, d, m in zip(docs, dists, metas):
-        out.append(RetrievedChunk(text=t, distance=float(d), metadata=m or {}))
+    dense = {
+        i: RetrievedChunk(text=t, distance=float(d), metadata=m or {})
+        for i, t, d, m in zip(ids, docs, dists, metas)
+    }
+    if not keyword_hits:
+        return [dense[i] for i in ids[:top_k]]
+
+    fused = [doc_id for doc_id, _ in reciprocal_rank_fusion(
+        [list(ids), [doc_id for doc_id, _ in keyword_hits]], k=RRF_K)][:top_k]
+    keyword_only = [doc_id for doc_id in fused if doc_id not in dense]
+    if keyword_only:
+        with store.read():
+            index = store.keyword_index(collection_name)
+            distances = _distances(col, keyword_only, query_embedding)
+            for doc_id in keyword_only:
+                if doc_id in distances:  # skip chunks deleted since the search
+                    text, metadata = index.document(doc_id)
+                    dense[doc_id] = RetrievedChunk(text=text, distance=distances[doc_id], metadata=metadata)
+    return [dense[doc_id] for doc_id in fused if doc_id in dense]
+
+
+def _distances(col, ids: List[str], query_embedding: List[float]) -> Dict[str, float]:
+    """Squared L2 distance (Chroma's default space) from the query to stored chunks."""
+    res = col.get(ids=ids, include=["embeddings"])
+    out = {}
+    for doc_id, embedding in zip(res.get("ids", []), res.get("embeddings", None) or []):
+        out[doc_id] = float(sum((float(a) - b) ** 2 for a, b in zip(embedding, query_embedding)))
     return out
 
 
@@ -136,27 +301,19 @@ SYSTEM_PROMPT = (
 )
 
 
-def answer_with_llm(
-    query: str,
-    context: str,
-    provider: Provider = "auto",
-    openai_model: str = "gpt-4o-mini",
-    gemini_model: str = "gemini-2.5-flash",
-    temperature: float = 0.2,
-) -> str:
-    """Generate an answer grounded on context using the chosen LLM provider."""
+def _resolve_provider(provider: Provider) -> Optional[str]:
+    """Auto selection preference: Gemini then OpenAI. None when no LLM is configured."""
+    if provider != "auto":
+        return provider
+    if HAS_GEMINI and (os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")):
+        return "gemini"
+    if OpenAI and os.getenv("OPENAI_API_KEY"):
+        return "openai"
+    return None
 
-    # Auto selection preference: Gemini then OpenAI
-    if provider == "auto":
-        if HAS_GEMINI and (os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")):
-            provider = "gemini"
-        elif OpenAI and os.getenv("OPENAI_API_KEY"):
-            provider = "openai"
-        else:
-            # No LLM available: return a fallback synthesized response
-            return _fallback_answer(query, context)
 
-    user_prompt = textwrap.dedent(f"""
+def _user_prompt(query: str, context: str) -> str:
+    return textwrap.dedent(f"""
     Question:
     {query}
 
@@ -169,13 +326,31 @@ def answer_with_llm(
     - Keep it concise and helpful.
     """)
 
+
+def answer_with_llm(
+    query: str,
+    context: str,
+    provider: Provider = "auto",
+    openai_model: str = "gpt-4o-mini",
+    gemini_model: str = "gemini-2.5-flash",
+    temperature: float = 0.2,
+) -> str:
+    """Generate an answer grounded on context using the chosen LLM provider."""
+
+    provider = _resolve_provider(provider)
+    if provider is None:
+        # No LLM available: return a fallback synthesized response
+        return _fallback_answer(query, context)
+
+    user_prompt = _user_prompt(query, context)
+
     if provider == "gemini":
         client = _gemini_client(gemini_model)
         if not client:
             return _fallback_answer(query, context)
         try:
             full_prompt = f"{SYSTEM_PROMPT}\n\n{user_prompt}"
-            resp = client.generate_content(full_prompt)
+            resp = llm_clients.call("gemini", client.generate_content, full_prompt)
             return (getattr(resp, "text", None) or "").strip() or _fallback_answer(query, context)
         except Exception as e:
             logger.error(f"Gemini error: {e}")
@@ -186,7 +361,9 @@ def answer_with_llm(
         if not client:
             return _fallback_answer(query, context)
         try:
-            chat = client.chat.completions.create(
+            chat = llm_clients.call(
+                "openai",
+                client.chat.completions.create,
                 model=openai_model,
                 messages=[
                     {"role": "system", "content": SYSTEM_PROMPT},
@@ -203,6 +380,74 @@ def answer_with_llm(
     return _fallback_answer(query, context)
 
 
+def stream_answer_with_llm(
+    query: str,
+    context: str,
+    provider: Provider = "auto",
+    openai_model: str = "gpt-4o-mini",
+    gemini_model: str = "gemini-2.5-flash",
+    temperature: float = 0.2,
+) -> Iterator[str]:
+    """Like answer_with_llm, but yields the answer in pieces as the provider streams it.
+
+    Falls back to the non-LLM answer if the provider fails before its first
+    token; a failure mid-answer is re-raised so callers can tell the answer
+    is incomplete.
+    """
+    provider = _resolve_provider(provider)
+    user_prompt = _user_prompt(query, context)
+    pieces: Optional[Iterator[str]] = None
+    try:
+        if provider == "gemini":
+            client = _gemini_client(gemini_model)
+            if client:
+                stream = llm_clients.call(
+                    "gemini", client.generate_content, f"{SYSTEM_PROMPT}\n\n{user_prompt}", stream=True
+                )
+                pieces = (getattr(chunk, "text", None) or "" for chunk in stream)
+        elif provider == "openai":
+            client = _openai_client()
+            if client:
+                stream = llm_clients.call(
+                    "openai",
+                    client.chat.completions.create,
+                    model=openai_model,
+                    messages=[
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user", "content": user_prompt},
+                    ],
+                    temperature=temperature,
+                    stream=True,
+                )
+                pieces = (
+                    (chunk.choices[0].delta.content or "") if chunk.choices else ""
+                    for chunk in stream
+                )
+    except Exception as e:
+        logger.error(f"{provider} streaming error: {e}")
+        pieces = None
+
+    if pieces is None:
+        yield _fallback_answer(query, context)
+        return
+
+    sent = False
+    try:
+        for piece in pieces:
+            if piece:
+                sent = True
+                yield piece
+    except Exception as e:
+        logger.error(f"{provider} streaming error: {e}")
+        if sent:
+            # The answer is truncated: let the caller report an error, not a finished answer
+            raise
+        yield _fallback_answer(query, context)
+        return
+    if not sent:
+        yield _fallback_answer(query, context)
+
+
 def _fallback_answer(query: str, context: str) -> str:
     # Minimal non-LLM fallback: echo key info
     preview = context[:700]
@@ -219,17 +464,82 @@ def rag_answer(
     db_dir: str = "./vectordb",
     provider: Provider = "auto",
     show_sources: bool = False,
+    use_cache: bool = True,
 ) -> Tuple[str, List[RetrievedChunk]]:
-    """Full RAG pipeline: retrieve chunks then call LLM for final answer."""
-    chunks = retrieve_top_k(query, top_k=top_k, collection_name=collection_name, db_dir=db_dir)
-    context = build_context(chunks)
-    answer = answer_with_llm(query, context, provider=provider)
+    """Full RAG pipeline: retrieve chunks then call LLM for final answer.
+
+    With use_cache, repeated and near-duplicate questions are answered from
+    the query cache (see query_cache.py) without retrieval or an LLM call.
+    """
+    cached = None
+    if use_cache:
+        generation = query_cache.generation(collection_name, db_dir)
+        cached = query_cache.get(query, top_k, collection_name, db_dir, provider)
+        if cached is None:
+            query_embedding = embedding_engine.embed_query(query)
+            cached = query_cache.get_similar(query_embedding, top_k, collection_name, db_dir, provider)
+
+    if cached is not None:
+        answer, chunks = cached.answer, list(cached.chunks)
+    else:
+        chunks = retrieve_top_k(query, top_k=top_k, collection_name=collection_name, db_dir=db_dir)
+        context = build_context(chunks)
+        answer = answer_with_llm(query, context, provider=provider)
+        # Never cache the no-LLM fallback; a later call may reach the provider
+        if use_cache and answer != _fallback_answer(query, context):
+            query_cache.put(query, top_k, collection_name, db_dir, provider,
+                            answer, chunks, query_embedding, generation)
+
     if show_sources:
         src_lines = [f"- source={c.metadata.get('source','?')} idx={c.metadata.get('index','?')} dist={c.distance:.3f}" for c in chunks]
         answer = answer + "\n\nSources:\n" + "\n".join(src_lines)
     return answer, chunks
 
 
+def rag_answer_stream(
+    query: str,
+    top_k: int = 5,
+    collection_name: str = "audiobook_embeddings",
+    db_dir: str = "./vectordb",
+    provider: Provider = "auto",
+    use_cache: bool = True,
+) -> Tuple[List[RetrievedChunk], Iterator[str]]:
+    """Streaming RAG: retrieve chunks now, return them with an iterator of answer pieces.
+
+    Retrieval errors are raised here, before any output is produced. Cached
+    answers are returned as a single piece; only a fully streamed LLM answer
+    is added to the query cache (a provider error mid-answer propagates out
+    of the iterator). Time to first token is logged.
+    """
+    started = time.perf_counter()
+    query_embedding = None
+    if use_cache:
+        generation = query_cache.generation(collection_name, db_dir)
+        cached = query_cache.get(query, top_k, collection_name, db_dir, provider)
+        if cached is None:
+            query_embedding = embedding_engine.embed_query(query)
+            cached = query_cache.get_similar(query_embedding, top_k, collection_name, db_dir, provider)
+        if cached is not None:
+            return list(cached.chunks), iter([cached.answer])
+
+    chunks = retrieve_top_k(query, top_k=top_k, collection_name=collection_name, db_dir=db_dir)
+    context = build_context(chunks)
+
+    def pieces() -> Iterator[str]:
+        answer = []
+        for piece in stream_answer_with_llm(query, context, provider=provider):
+            if not answer:
+                logger.info(f"Time to first token: {time.perf_counter() - started:.2f}s")
+            answer.append(piece)
+            yield piece
+        full = "".join(answer)
+        if use_cache and full != _fallback_answer(query, context):
+            query_cache.put(query, top_k, collection_name, db_dir, provider,
+                            full, chunks, query_embedding, generation)
+
+    return chunks, pieces()
+
+
 def main():
     import argparse
     p = argparse.ArgumentParser(description="RAG query against ChromaDB and LLM answer")
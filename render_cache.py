@@ -0,0 +1,66 @@
+"""
+Resumable audiobook rendering
+
+Every synthesised chunk is stored in a content-addressed render cache,
+keyed by the chunk text hash plus everything else that changes the audio
+(engine, model, voice, rate, sample rate). A render that crashed at chunk
+380 of 400 restarts with 379 chunks already done, and a small text fix in
+a finished book only re-renders the chunks whose text changed.
+
+Each render also writes a manifest (<output>.manifest.json) listing its
+chunks in order with their cache keys and whether they were reused, so a
+finished book can be inspected or re-assembled later.
+
+Environment variables:
+- RENDER_CACHE_DIR: cache directory (default ./.render_cache)
+- RENDER_CACHE_MAX_MB: size bound, least recently used chunks are evicted
+  first (default 4096)
+"""
+
+from __future__ import annotations
+
+import os
+import json
+import time
+import hashlib
+from typing import Any, Dict, List
+
+from disk_cache import DiskCache
+
+render_cache = DiskCache(
+    directory=os.getenv("RENDER_CACHE_DIR", ".render_cache"),
+    max_bytes=int(os.getenv("RENDER_CACHE_MAX_MB", "4096")) * 1024 * 1024,
+    suffix=".audio",
+)
+
+
+def render_key(text: str, **settings: Any) -> str:
+    """Cache key of one chunk: its text hash plus the settings that shape its audio."""
+    digest = hashlib.sha256(text.encode("utf-8"))
+    digest.update(json.dumps(settings, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def write_manifest(output_file: str, settings: Dict[str, Any], chunks: List[Dict[str, Any]]) -> str:
+    """Write <output_file>.manifest.json and return its path.
+
+    chunks: one dict per chunk in playback order, with at least "key" and
+    "reused".
+    """
+    path = f"{output_file}.manifest.json"
+    manifest = {
+        "output": os.path.basename(output_file),
+        "created_at": time.time(),
+        "settings": settings,
+        "chunks": chunks,
+        "reused": sum(1 for chunk in chunks if chunk.get("reused")),
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def get_render_cache_stats() -> Dict[str, Any]:
+    return render_cache.stats()
@@ -1,9 +1,13 @@
 import os
+import hashlib
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional, Tuple
 
-import google.generativeai as genai
+from chunking import chunk_sections
+from llm_clients import llm_clients
+from disk_cache import DiskCache
 
 AUDIOBOOK_SYSTEM_PROMPT = """You are an expert audiobook narrator.
 
@@ -26,34 +30,145 @@ Follow these rules strictly:
 """
 
 
+# Prompt for every chunk after the first: same rules, but no greeting/overview
+CONTINUATION_PROMPT = AUDIOBOOK_SYSTEM_PROMPT + """
+IMPORTANT: This text is a CONTINUATION of an audiobook that is already in progress.
+Do NOT greet the listeners and do NOT give an overview; ignore rules 2 and 3 above.
+Continue the narration naturally from where the previous part left off.
+"""
+
+# Chunking defaults for long documents (characters, not tokens)
+MAX_CHUNK_CHARS = int(os.getenv("ENRICH_MAX_CHUNK_CHARS", "12000"))
+OVERLAP_CHARS = int(os.getenv("ENRICH_OVERLAP_CHARS", "600"))
+CONCURRENCY = int(os.getenv("ENRICH_CONCURRENCY", "4"))
+
+# Chunk-level cache of enriched narration, so unchanged chunks are never re-sent
+enrichment_cache = DiskCache(
+    directory=os.getenv("ENRICH_CACHE_DIR", ".enrichment_cache"),
+    max_bytes=int(os.getenv("ENRICH_CACHE_MAX_MB", "256")) * 1024 * 1024,
+    ttl_seconds=float(os.getenv("ENRICH_CACHE_TTL_DAYS", "30")) * 24 * 3600,
+)
+
 def configure_gemini(api_key: Optional[str] = None, model_name: str = "gemini-2.5-pro"):
-    """Configure and return a Gemini GenerativeModel instance."""
+    """Return the shared Gemini GenerativeModel instance for model_name."""
     key = api_key or os.getenv("GEMINI_API_KEY")
     if not key:
         raise RuntimeError(
             "GEMINI_API_KEY is not set. Please set it in your environment before running this script."
         )
 
-    genai.configure(api_key=key)
-    return genai.GenerativeModel(model_name)
+    model = llm_clients.gemini_model(model_name, api_key=key)
+    if model is None:
+        raise RuntimeError(
+            "google-generativeai is not installed. Install it with: pip install google-generativeai"
+        )
+    return model
+
+
+def enrich_text_with_gemini(
+    source_text: str,
+    model_name: str = "gemini-2.5-pro",
+    max_chunk_chars: int = MAX_CHUNK_CHARS,
+    overlap_chars: int = OVERLAP_CHARS,
+    concurrency: int = CONCURRENCY,
+    model=None,
+    use_cache: bool = True,
+) -> str:
+    """Send the source text to Gemini and return audiobook-style narration.
+
+    Long documents are split on page/section boundaries, enriched chunk by
+    chunk with up to `concurrency` requests in flight, and stitched back in
+    order. `model` may be any object with generate_content(prompt) returning
+    something with a .text attribute (e.g. a local fake for testing).
+
+    Each chunk's narration is cached by hash of (chunk, context, model name,
+    prompt), so after a small edit only the changed chunks are re-enriched.
+    An injected `model` is only cached under its own `model_name`
+    attribute; models without one (such as test fakes) are never cached.
+    """
+    chunks = split_for_enrichment(source_text, max_chunk_chars, overlap_chars)
+    if len(chunks) <= 1:
+        chunks = [(source_text, "")]
+
+    cache_model = model_name if model is None else getattr(model, "model_name", None)
+    use_cache = use_cache and bool(cache_model)
+
+    def get_model():
+        # Only configure Gemini if at least one chunk misses the cache
+        return model if model is not None else configure_gemini(model_name=model_name)
+
+    def run(indexed_chunk):
+        index, (chunk, context) = indexed_chunk
+        first = index == 0
+        key = _cache_key(chunk, context, cache_model, first) if use_cache else None
+        if key:
+            cached = enrichment_cache.get(key)
+            if cached is not None:
+                return cached
+        narration = _enrich_chunk(get_model(), chunk, context=context, first=first)
+        if key and narration:
+            enrichment_cache.set(key, narration)
+        return narration
+
+    if len(chunks) == 1:
+        return run((0, chunks[0]))
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        # map() keeps results in chunk order regardless of completion order
+        parts = list(pool.map(run, enumerate(chunks)))
+    return "\n\n".join(part for part in parts if part)
+
 
+def _cache_key(chunk: str, context: str, model_name: str, first: bool) -> str:
+    digest = hashlib.sha256()
+    for part in (chunk, context, model_name, AUDIOBOOK_SYSTEM_PROMPT if first else CONTINUATION_PROMPT):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
 
-def enrich_text_with_gemini(source_text: str, model_name: str = "gemini-2.5-pro") -> str:
-    """Send the source text to Gemini and return audiobook-style narration."""
-    model = configure_gemini(model_name=model_name)
 
-    # We send the system prompt plus the raw source text in a single request.
+def get_enrichment_cache_stats() -> dict:
+    """Return enrichment cache hit/miss counters, hit rate and size."""
+    return enrichment_cache.stats()
+
+
+def _enrich_chunk(model, chunk: str, context: str, first: bool) -> str:
+    """Enrich one chunk; only the first chunk gets the greeting/overview prompt."""
     prompt = (
-        AUDIOBOOK_SYSTEM_PROMPT
+        (AUDIOBOOK_SYSTEM_PROMPT if first else CONTINUATION_PROMPT)
         + "\n\n---\n\nHere is the source text that must be transformed into audiobook narration. "
         + "Remember: do NOT summarize or remove important details. Keep all information, just rewrite the style.\n\n"
-        + source_text
     )
-
-    response = model.generate_content(prompt)
+    if context:
+        prompt += (
+            "For continuity only, this is the end of the PREVIOUS part (already narrated, do NOT narrate it again):\n"
+            + context
+            + "\n\nSource text to narrate now:\n\n"
+        )
+    response = llm_clients.call("gemini", model.generate_content, prompt + chunk)
     return response.text.strip()
 
 
+def split_for_enrichment(
+    text: str,
+    max_chunk_chars: int = MAX_CHUNK_CHARS,
+    overlap_chars: int = OVERLAP_CHARS,
+) -> List[Tuple[str, str]]:
+    """Split text into (chunk, context) pairs for chunked enrichment.
+
+    Chunks are packed from whole sections (blank-line separated paragraphs
+    and '--- Page N ---' pages, markers removed) up to max_chunk_chars; see
+    chunking.chunk_sections. A section that is too long on its own is split
+    on sentence boundaries. Cut points are content-defined (stable_cuts),
+    so an edit only changes the chunks around it and the rest stay cached.
+    Each chunk carries the
+    last ~overlap_chars of the previous chunk as context, so the model can
+    keep the narration flowing without repeating it.
+    """
+    return [(chunk.text, chunk.context)
+            for chunk in chunk_sections(text, max_chunk_chars, overlap_chars, stable_cuts=True)]
+
+
 def load_text(path: Path) -> str:
     """Load UTF-8 text from a file."""
     return path.read_text(encoding="utf-8")
@@ -90,6 +205,24 @@ def main():
         help="Gemini model name to use (default: gemini-2.5-pro)",
     )
 
+    parser.add_argument(
+        "--max-chunk-chars",
+        type=int,
+        default=MAX_CHUNK_CHARS,
+        help=f"Split longer texts into chunks of about this many characters (default: {MAX_CHUNK_CHARS})",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=CONCURRENCY,
+        help=f"Maximum number of chunks enriched at the same time (default: {CONCURRENCY})",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ignore the enrichment cache and re-enrich every chunk",
+    )
+
     args = parser.parse_args()
 
     input_path = Path(args.input_file).expanduser().resolve()
@@ -104,7 +237,13 @@ def main():
     source_text = load_text(input_path)
 
     # Enrich text via Gemini
-    enriched_text = enrich_text_with_gemini(source_text, model_name=args.model_name)
+    enriched_text = enrich_text_with_gemini(
+        source_text,
+        model_name=args.model_name,
+        max_chunk_chars=args.max_chunk_chars,
+        concurrency=args.concurrency,
+        use_cache=not args.no_cache,
+    )
 
     # Save enriched output
     output_filename = input_path.stem + "_enriched.txt"
@@ -112,6 +251,8 @@ def main():
     save_text(output_path, enriched_text)
 
     print(f"Enriched audiobook narration saved at: {output_path}")
+    stats = get_enrichment_cache_stats()
+    print(f"Enrichment cache: {stats['hits']} hits, {stats['misses']} misses")
 
 
 if __name__ == "__main__":
@@ -13,8 +13,12 @@ Version: 1.0.0
 
 from .extractor import (
     extract_text_from_file,
+    iter_extracted_pages,
+    PageRecord,
     validate_extracted_text,
     get_file_info,
+    get_cache_stats,
+    get_ocr_strategy_stats,
     enhance_image_for_ocr,
     tesseract_available
 )
@@ -25,8 +29,12 @@ __email__ = "[Your Email]"
 
 __all__ = [
     'extract_text_from_file',
+    'iter_extracted_pages',
+    'PageRecord',
     'validate_extracted_text',
     'get_file_info',
+    'get_cache_stats',
+    'get_ocr_strategy_stats',
     'enhance_image_for_ocr',
     'tesseract_available'
 ]
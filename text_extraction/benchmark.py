@@ -0,0 +1,183 @@
+"""
+Extraction Memory Benchmark
+
+Compares peak RSS of the extraction paths on a given document:
+
+- in-memory: the upload object is parsed directly (no copies)
+- spooled:   the upload is copied to a temp file in blocks, then parsed from disk
+- legacy:    the pre-1.3 behaviour, getvalue() written to a temp file, parsed from its path
+             (ported below as _legacy_extract so later extractor changes don't alter it)
+
+Each mode runs in a fresh interpreter so peaks don't leak between runs.
+
+Usage:
+    python -m text_extraction.benchmark "source_files/Mod2 - AWS-S3.pdf"
+    python -m text_extraction.benchmark big.pdf --modes in-memory spooled
+
+Measured on Linux with pdfplumber 0.11 and one worker:
+
+    121 MB PDF (300 text pages plus embedded image data)
+    mode        extra peak MB  peak RSS MB  seconds     chars
+    in-memory          1381.7       1520.0    49.02   1104430
+    spooled            1381.8       1520.1    65.52   1104430
+    legacy             1379.5       1517.9    51.48   1104430
+
+    96 MB TXT
+    in-memory           186.7        301.3     0.55  96388889
+    spooled             277.8        392.4     0.52  96388889
+    legacy              186.2        300.8     0.50  96388889
+
+For PDFs the peak is pdfminer's parse state, not copies of the upload.
+BytesIO.getvalue() shares its buffer until the upload is written to, so
+the legacy copy costs no RSS either; the temp-file write costs disk I/O.
+
+Note: uses the ``resource`` module, so it runs on Linux/macOS only.
+"""
+
+import io
+import os
+import sys
+import time
+import argparse
+import subprocess
+import tempfile
+from itertools import islice
+
+from text_extraction import extractor
+
+MODES = ['in-memory', 'spooled', 'legacy']
+
+
+class _Upload(io.BytesIO):
+    """Stand-in for an upload held in memory (FastAPI/Streamlit both do this)."""
+    def __init__(self, content: bytes, name: str):
+        super().__init__(content)
+        self.name = name
+        self.size = len(content)
+
+
+def _peak_rss_mb() -> float:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return peak / 1024 if sys.platform != 'darwin' else peak / (1024 * 1024)
+
+
+def _legacy_iter_txt(filepath: str):
+    with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
+        block_number = 0
+        while True:
+            lines = f.readlines(1024 * 1024)
+            if not lines:
+                break
+            block_number += 1
+            yield extractor.PageRecord(block_number, "".join(lines), 'txt')
+
+
+def _legacy_iter_pdf(filepath: str):
+    # pdfplumber, then PyPDF2, each opening the temp file by path (one worker)
+    try:
+        import pdfplumber
+        with pdfplumber.open(filepath) as pdf:
+            found_text = False
+            for page in pdf.pages:
+                page_text = page.extract_text() or ""
+                page.flush_cache()
+                if page_text.strip():
+                    found_text = True
+                    yield extractor.PageRecord(page.page_number, page_text, 'pdfplumber')
+        if found_text:
+            return
+    except ImportError:
+        pass
+    import PyPDF2
+    with open(filepath, 'rb') as f:
+        for page_num, page in enumerate(PyPDF2.PdfReader(f).pages):
+            page_text = page.extract_text() or ""
+            if page_text.strip():
+                yield extractor.PageRecord(page_num + 1, page_text, 'PyPDF2')
+
+
+def _legacy_iter_docx(filepath: str):
+    from docx import Document
+    doc = Document(filepath)
+    paragraphs = (para.text for para in doc.paragraphs if para.text.strip())
+    group_number = 0
+    while True:
+        group = list(islice(paragraphs, extractor.DOCX_PARAGRAPHS_PER_RECORD))
+        if not group:
+            break
+        group_number += 1
+        yield extractor.PageRecord(group_number, "\n".join(group), 'python-docx')
+
+
+def _legacy_extract(uploaded_file) -> str:
+    """The pre-1.3 extract_text_from_file: getvalue() to a temp file, parsed from its path."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=uploaded_file.name) as tmp_file:
+        tmp_file.write(uploaded_file.getvalue())
+        tmp_path = tmp_file.name
+    try:
+        file_ext = uploaded_file.name.lower().split('.')[-1]
+        if file_ext == 'txt':
+            records = _legacy_iter_txt(tmp_path)
+        elif file_ext == 'pdf':
+            records = _legacy_iter_pdf(tmp_path)
+        elif file_ext == 'docx':
+            records = _legacy_iter_docx(tmp_path)
+        elif file_ext in ['jpg', 'jpeg', 'png', 'bmp']:
+            return extractor._extract_image(tmp_path).strip()
+        else:
+            return f"🚫 Unsupported file type: {file_ext}"
+        return "".join(extractor._render_record(record) for record in records).strip()
+    finally:
+        os.unlink(tmp_path)
+
+
+def _run_child(mode: str, path: str) -> None:
+    with open(path, 'rb') as f:
+        upload = _Upload(f.read(), os.path.basename(path))
+    baseline = _peak_rss_mb()
+
+    started = time.perf_counter()
+    if mode == 'in-memory':
+        extractor.IN_MEMORY_MAX_BYTES = upload.size + 1
+        text = extractor.extract_text_from_file(upload, use_cache=False)
+    elif mode == 'spooled':
+        extractor.IN_MEMORY_MAX_BYTES = 0
+        text = extractor.extract_text_from_file(upload, use_cache=False)
+    else:
+        text = _legacy_extract(upload)
+    elapsed = time.perf_counter() - started
+
+    print(f"{mode}\t{_peak_rss_mb() - baseline:.1f}\t{_peak_rss_mb():.1f}\t{elapsed:.2f}\t{len(text)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak-RSS benchmark of the extraction paths")
+    parser.add_argument("input_file", help="Document to extract (PDF, DOCX, TXT or image)")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES, help="Modes to run")
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _run_child(args.child, args.input_file)
+        return
+
+    size_mb = os.path.getsize(args.input_file) / (1024 * 1024)
+    print(f"File: {args.input_file} ({size_mb:.1f} MB)\n")
+    print(f"{'mode':<10} {'extra peak MB':>14} {'peak RSS MB':>12} {'seconds':>8} {'chars':>9}")
+    for mode in args.modes:
+        env = dict(os.environ, PDF_EXTRACT_WORKERS="1")  # compare the copy strategy, not parallelism
+        result = subprocess.run(
+            [sys.executable, "-m", "text_extraction.benchmark", args.input_file, "--child", mode],
+            capture_output=True, text=True, env=env,
+        )
+        if result.returncode != 0:
+            print(f"{mode:<10} failed: {result.stderr.strip().splitlines()[-1:]}")
+            continue
+        name, extra, peak, seconds, chars = result.stdout.strip().splitlines()[-1].split('\t')
+        print(f"{name:<10} {extra:>14} {peak:>12} {seconds:>8} {chars:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Extraction Cache Module
+
+Persistent, content-addressed cache for extracted text. Entries are keyed by
+the SHA-256 of the uploaded file bytes plus the extractor version and the
+options that influence the output, so re-uploading the same document skips
+pdfplumber/Tesseract entirely. The cache directory is bounded in size and
+evicts least-recently-used entries first; entries can optionally expire
+(see disk_cache.DiskCache).
+"""
+
+import json
+import hashlib
+
+from disk_cache import DiskCache  # noqa: F401 (re-exported)
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_cache_key(uploaded_file, version: str, **options) -> str:
+    """
+    Build a cache key from the file contents, extractor version and options
+    
+    Args:
+        uploaded_file: File-like object with read() and seek() methods
+        version: Extractor version; bump it whenever output changes
+        **options: Any settings that change the extracted text
+        
+    Returns:
+        Hex SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    uploaded_file.seek(0)
+    for block in iter(lambda: uploaded_file.read(HASH_BLOCK_SIZE), b''):
+        digest.update(block)
+    uploaded_file.seek(0)
+    digest.update(version.encode('utf-8'))
+    digest.update(json.dumps(options, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
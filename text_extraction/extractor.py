@@ -5,115 +5,311 @@ This module handles text extraction from various file formats with fallback logi
 It uses the same exact libraries and logic as the original app.py.
 """
 
+import io
 import tempfile
 import os
 import re
+import shutil
+import subprocess
+import time
 import logging
-from typing import Tuple, Dict, Any
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+from typing import Tuple, Dict, Any, List, Optional, Iterator, Iterable, BinaryIO, Union
 from PIL import Image, ImageEnhance, ImageFilter
 
+from disk_cache import DiskCache
+from .cache import file_cache_key
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# A document to extract from: a path on disk, or a seekable in-memory upload
+Source = Union[str, BinaryIO]
+
 # OCR setup - Same as original app.py
 try:
     import pytesseract
-    # Try to set tesseract path for Windows
-    try:
-        pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-    except:
-        pass
+    # Use the default Windows install if it is there, otherwise the binary on PATH
+    _WINDOWS_TESSERACT = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+    if os.path.exists(_WINDOWS_TESSERACT):
+        pytesseract.pytesseract.tesseract_cmd = _WINDOWS_TESSERACT
+    else:
+        pytesseract.pytesseract.tesseract_cmd = shutil.which('tesseract') or 'tesseract'
     tesseract_available = True
     logger.info("Tesseract OCR is available")
 except ImportError:
     tesseract_available = False
     logger.warning("Tesseract OCR not available. Image text extraction will be limited.")
 
-def extract_text_from_file(uploaded_file) -> str:
+# Parallel PDF extraction settings
+# PDF_EXTRACT_WORKERS=1 disables the process pool; default is one worker per core
+PDF_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "0")) or (os.cpu_count() or 1)
+PDF_PARALLEL_MIN_PAGES = 16  # smaller documents are faster without pool start-up cost
+PDF_SHARDS_PER_WORKER = 4
+# Rasterise and OCR pages that have no text layer (scanned handouts)
+PDF_OCR_SCANNED = os.getenv("PDF_OCR_SCANNED", "true").lower() in ("1", "true", "yes")
+PDF_OCR_RESOLUTION = int(os.getenv("PDF_OCR_RESOLUTION", "300"))  # DPI
+
+# Streaming settings
+COPY_BLOCK_SIZE = 1024 * 1024  # bytes copied / characters read per block
+# Uploads up to this size are parsed straight from memory; larger ones are
+# spooled to a temp file up front (PDFs long enough to shard are spooled
+# when the process pool starts, whatever their size)
+IN_MEMORY_MAX_BYTES = int(os.getenv("EXTRACT_IN_MEMORY_MAX_MB", "32")) * 1024 * 1024
+DOCX_PARAGRAPHS_PER_RECORD = 50
+
+# OCR strategies in priority order, run in parallel: (name, image variant, Tesseract PSM mode)
+OCR_STRATEGIES = [
+    ('original-psm6', 'original', '6'),   # Assume a single uniform block of text
+    ('enhanced-psm6', 'enhanced', '6'),
+    ('original-psm1', 'original', '1'),   # Automatic page segmentation with OSD
+    ('original-psm3', 'original', '3'),   # Fully automatic page segmentation
+    ('original-psm4', 'original', '4'),   # Assume a single column of text
+    ('original-psm11', 'original', '11'), # Sparse text
+    ('original-psm12', 'original', '12'), # Sparse text with OSD
+]
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "0")) or min(len(OCR_STRATEGIES), os.cpu_count() or 1)
+OCR_STRATEGY_TIMEOUT = int(os.getenv("OCR_STRATEGY_TIMEOUT", "120"))  # seconds per Tesseract run
+_ocr_stats: Dict[str, Dict[str, Any]] = {}
+_ocr_stats_lock = threading.Lock()
+
+# Bump whenever a change alters extracted output, so stale cache entries are ignored
+EXTRACTOR_VERSION = "1.3.1"
+
+# Persistent extraction cache, keyed by file hash + EXTRACTOR_VERSION + options
+extraction_cache = DiskCache(
+    directory=os.getenv("EXTRACTION_CACHE_DIR", ".extraction_cache"),
+    max_bytes=int(os.getenv("EXTRACTION_CACHE_MAX_MB", "512")) * 1024 * 1024,
+)
+
+@dataclass
+class PageRecord:
+    """One unit of extracted text as produced by the streaming extractors.
+
+    ``page_number`` is the 1-based page for PDFs and the block/paragraph group
+    index for other formats. ``extractor`` names the library that produced the
+    text, or ``"error"`` when ``text`` is an error message.
+    """
+    page_number: int
+    text: str
+    extractor: str
+
+# How each extractor's records are laid out when joined into one string
+_RECORD_TEMPLATES = {
+    'pdfplumber': "--- Page {page_number} ---\n{text}\n\n",
+    'PyPDF2': "--- Page {page_number} ---\n{text}\n\n",
+    'ocr': "--- Page {page_number} ---\n{text}\n\n",
+    'python-docx': "{text}\n",
+}
+
+def iter_extracted_pages(uploaded_file, pdf_workers: Optional[int] = None) -> Iterator[PageRecord]:
+    """
+    Stream extracted text page by page
+    
+    Yields PageRecord objects as soon as each page (or block of paragraphs)
+    is extracted, so callers can start processing before the whole document
+    is done. Only a bounded window of pages is held in memory at a time.
+    
+    Args:
+        uploaded_file: File-like object with read() method and name attribute
+        pdf_workers: Worker processes for PDF extraction (default: PDF_WORKERS)
+        
+    Yields:
+        PageRecord for each extracted page, in document order
+    """
+    # Small uploads are read straight from the upload object; only large ones
+    # are spooled to disk, where process-pool workers can open them by path
+    tmp_path = None
+    source = uploaded_file
+    if _upload_size(uploaded_file) > IN_MEMORY_MAX_BYTES:
+        tmp_path = source = _spool_to_tempfile(uploaded_file)
+    else:
+        uploaded_file.seek(0)
+    try:
+        file_ext = uploaded_file.name.lower().split('.')[-1]
+        logger.info(f"Extracting text from {uploaded_file.name} (type: {file_ext}, "
+                    f"{'spooled to disk' if tmp_path else 'in memory'})")
+        yield from _iter_source(source, file_ext, pdf_workers)
+    finally:
+        # Clean up temporary file
+        if tmp_path and os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+def _iter_source(source: Source, file_ext: str, pdf_workers: Optional[int] = None) -> Iterator[PageRecord]:
+    """Dispatch to the extractor for file_ext"""
+    if file_ext == 'txt':
+        yield from _iter_txt(source)
+    elif file_ext == 'pdf':
+        yield from _iter_pdf(source, workers=pdf_workers)
+    elif file_ext == 'docx':
+        yield from _iter_docx(source)
+    elif file_ext in ['jpg', 'jpeg', 'png', 'bmp']:
+        yield from _iter_image(source)
+    else:
+        yield PageRecord(0, f"🚫 Unsupported file type: {file_ext}", 'error')
+
+def extract_text_from_file(uploaded_file, pdf_workers: Optional[int] = None,
+                           use_cache: bool = True) -> str:
     """
     Extract text from various file types - NO TRUNCATION
     
     This is the MAIN extraction function that handles all file formats.
+    It joins the records produced by iter_extracted_pages() and serves
+    repeat uploads of the same file from the extraction cache.
     
     Args:
         uploaded_file: File-like object with read() method and name attribute
+        pdf_workers: Worker processes for PDF extraction (default: PDF_WORKERS)
+        use_cache: Look up and store the result in the extraction cache
         
     Returns:
         Extracted text as string, or error message if extraction fails
     """
     try:
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=uploaded_file.name) as tmp_file:
-            tmp_file.write(uploaded_file.getvalue())
-            tmp_path = tmp_file.name
-        
-        file_ext = uploaded_file.name.lower().split('.')[-1]
-        text = ""
-        
-        logger.info(f"Extracting text from {uploaded_file.name} (type: {file_ext})")
-        
-        # Dispatch based on file extension
-        if file_ext == 'txt':
-            text = _extract_txt(tmp_path)
-                
-        elif file_ext == 'pdf':
-            text = _extract_pdf(tmp_path)
-                
-        elif file_ext == 'docx':
-            text = _extract_docx(tmp_path)
-                
-        elif file_ext in ['jpg', 'jpeg', 'png', 'bmp']:
-            text = _extract_image(tmp_path)
-        else:
-            text = f"🚫 Unsupported file type: {file_ext}"
-        
-        # Clean up temporary file
-        if os.path.exists(tmp_path):
-            os.unlink(tmp_path)
+        cache_key = None
+        if use_cache:
+            file_ext = uploaded_file.name.lower().split('.')[-1]
+            cache_key = file_cache_key(uploaded_file, EXTRACTOR_VERSION, ext=file_ext,
+                                        ocr_scanned=PDF_OCR_SCANNED and tesseract_available)
+            cached = extraction_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Extraction cache hit for {uploaded_file.name}: {len(cached)} chars")
+                return cached
         
+        parts = []
+        failed = False
+        for record in iter_extracted_pages(uploaded_file, pdf_workers=pdf_workers):
+            failed = failed or record.extractor == 'error'
+            parts.append(_render_record(record))
+        text = "".join(parts)
+        del parts  # release the per-page strings before strip() copies the text
+        text = text.strip()
         logger.info(f"Extraction complete. Got {len(text)} characters.")
         
         # Return extracted text or error message
-        return text.strip() if text.strip() else "📭 No text extracted from file."
+        if not text:
+            return "📭 No text extracted from file."
+        if cache_key and not failed:
+            extraction_cache.set(cache_key, text)
+        return text
         
     except Exception as e:
         logger.error(f"Extraction error: {e}")
         return f"🚫 Extraction error: {str(e)}"
 
-def _extract_txt(filepath: str) -> str:
+def get_cache_stats() -> Dict[str, Any]:
+    """Return extraction cache hit/miss counters and size."""
+    return extraction_cache.stats()
+
+def _upload_size(uploaded_file) -> int:
+    """Size of the upload in bytes, without reading it."""
+    position = uploaded_file.tell()
+    size = uploaded_file.seek(0, os.SEEK_END)
+    uploaded_file.seek(position)
+    return size
+
+@contextmanager
+def _open_binary(source: Source) -> Iterator[BinaryIO]:
+    """Open a path, or rewind an in-memory upload, for binary reading.
+
+    In-memory uploads are handed over as-is (no copy) and are not closed.
+    Their read position is restored on exit, so a page can be rendered for
+    OCR while another reader is part-way through the same upload.
+    """
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            yield f
+    else:
+        position = source.tell()
+        source.seek(0)
+        try:
+            yield source
+        finally:
+            source.seek(position)
+
+def _spool_to_tempfile(uploaded_file) -> str:
+    """Copy the upload to a temporary file in fixed-size blocks and return its path."""
+    suffix = os.path.basename(uploaded_file.name)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
+        uploaded_file.seek(0)
+        shutil.copyfileobj(uploaded_file, tmp_file, COPY_BLOCK_SIZE)
+        return tmp_file.name
+
+def _render_record(record: PageRecord) -> str:
+    """Lay out one record the way its extractor's single-string output does."""
+    return _RECORD_TEMPLATES.get(record.extractor, "{text}").format(
+        page_number=record.page_number, text=record.text)
+
+def _join_records(records: Iterable[PageRecord]) -> str:
+    """Join streamed records back into the single-string layout of each extractor."""
+    return "".join(_render_record(record) for record in records)
+
+def _extract_txt(source: Source) -> str:
     """Extract text from TXT files"""
+    return _join_records(_iter_txt(source))
+
+def _iter_txt(source: Source) -> Iterator[PageRecord]:
+    """Stream TXT files in blocks of lines"""
     try:
-        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-            return f.read()
-    except UnicodeDecodeError:
-        # Try with different encodings if utf-8 fails
-        encodings = ['latin-1', 'iso-8859-1', 'cp1252', 'utf-16']
-        for encoding in encodings:
+        with _open_binary(source) as raw:
+            f = io.TextIOWrapper(raw, encoding='utf-8', errors='ignore')
             try:
-                with open(filepath, 'r', encoding=encoding, errors='ignore') as f:
-                    return f.read()
-            except:
-                continue
-        return "🚫 TXT reading error: Could not decode file"
+                block_number = 0
+                while True:
+                    # readlines(hint) stops at a line boundary once hint chars are read
+                    lines = f.readlines(COPY_BLOCK_SIZE)
+                    if not lines:
+                        break
+                    block_number += 1
+                    yield PageRecord(block_number, "".join(lines), 'txt')
+            finally:
+                # Don't let the wrapper close the caller's upload object
+                f.detach()
     except Exception as e:
-        return f"🚫 TXT reading error: {str(e)}"
+        yield PageRecord(0, f"🚫 TXT reading error: {str(e)}", 'error')
 
-def _extract_pdf(filepath: str) -> str:
+def _extract_pdf(source: Source, workers: Optional[int] = None) -> str:
     """Extract text from PDF files with fallback"""
-    text = ""
+    return _join_records(_iter_pdf(source, workers=workers))
+
+def _iter_pdf(source: Source, workers: Optional[int] = None) -> Iterator[PageRecord]:
+    """Stream text from PDF files with fallback
+
+    Page ranges are sharded across a process pool (see ``PDF_WORKERS``); each
+    worker opens the file on its own and pages are yielded in page order.
+    Short in-memory sources are read serially without copying.
+    Pages without a text layer are rasterised and OCR'd (see ``PDF_OCR_SCANNED``).
+    If pdfplumber fails part-way, PyPDF2 resumes after the last yielded page.
+    """
+    next_page = 0
+    found_text = False
+    opened = False
     
     # Try pdfplumber first (most accurate)
     try:
         import pdfplumber
-        with pdfplumber.open(filepath) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += f"--- Page {page.page_number} ---\n{page_text}\n\n"
-        logger.info(f"PDF extraction with pdfplumber: {len(text)} chars")
-        if text:
-            return text
+        with _open_binary(source) as f, pdfplumber.open(f) as pdf:
+            page_count = len(pdf.pages)
+        opened = True
+        pages = _iter_page_shards(_pdfplumber_pages, source, page_count, workers)
+        if PDF_OCR_SCANNED and tesseract_available:
+            pages = _ocr_blank_pages(source, pages, workers)
+        else:
+            pages = ((page_number, page_text, 'pdfplumber') for page_number, page_text in pages)
+        for page_number, page_text, extractor in pages:
+            if page_text.strip():
+                found_text = True
+                next_page = page_number
+                yield PageRecord(page_number, page_text, extractor)
+        logger.info(f"PDF extraction with pdfplumber: {page_count} pages")
+        if found_text:
+            return
     except ImportError:
         logger.warning("pdfplumber not available, trying PyPDF2...")
     except Exception as e:
@@ -122,35 +318,196 @@ def _extract_pdf(filepath: str) -> str:
     # Fallback to PyPDF2
     try:
         import PyPDF2
-        with open(filepath, 'rb') as f:
-            pdf_reader = PyPDF2.PdfReader(f)
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                page_text = page.extract_text()
-                if page_text:
-                    text += f"--- Page {page_num + 1} ---\n{page_text}\n\n"
-        logger.info(f"PDF extraction with PyPDF2: {len(text)} chars")
-        if text:
-            return text
+        with _open_binary(source) as f:
+            page_count = len(PyPDF2.PdfReader(f).pages)
+        opened = True
+        pages = _iter_page_shards(_pypdf2_pages, source, page_count, workers, start=next_page)
+        for page_number, page_text in pages:
+            if page_text.strip():
+                found_text = True
+                yield PageRecord(page_number, page_text, 'PyPDF2')
+        logger.info(f"PDF extraction with PyPDF2: {page_count} pages")
+        if found_text:
+            return
     except ImportError:
         logger.warning("PyPDF2 not available")
     except Exception as e:
         logger.warning(f"PyPDF2 failed: {e}")
     
+    if found_text:
+        return
+    if opened:
+        # A library read the file, there just is no text layer
+        logger.warning("PDF has no text layer")
+        if tesseract_available:
+            yield PageRecord(0, "📭 No text found in PDF, even after OCR of scanned pages.", 'error')
+        else:
+            yield PageRecord(0, "📭 No text layer found in PDF (scanned document?). "
+                                "Install Tesseract OCR to read scanned pages: pip install pytesseract and install tesseract-ocr", 'error')
+        return
+    
     # If all methods fail
     logger.error("No PDF extraction library available")
-    return "📄 Install pdfplumber: pip install pdfplumber\nOr install PyPDF2: pip install PyPDF2"
+    yield PageRecord(0, "📄 Install pdfplumber: pip install pdfplumber\nOr install PyPDF2: pip install PyPDF2", 'error')
+
+def _ocr_blank_pages(source: Source, pages: Iterable[Tuple[int, str]],
+                     workers: Optional[int] = None) -> Iterator[Tuple[int, str, str]]:
+    """Fill in pages that have no text layer with OCR, keeping page order.
+
+    Blank pages are rasterised and OCR'd in a process pool while text pages
+    keep streaming in; results are released in page order as they complete.
+    Workers open the PDF by path, so an in-memory source is spooled to a
+    temp file at its first blank page. At most ``2 * workers`` OCR pages
+    are in flight, so memory stays bounded on long scanned documents.
+    
+    Yields:
+        (page_number, text, extractor) triples
+    """
+    workers = max(1, workers or PDF_WORKERS)
+    pool = None
+    tmp_path = None
+    filepath = source if isinstance(source, str) else None
+    pending = deque()  # (page_number, text or Future, extractor), in page order
+    in_flight = 0
+    try:
+        for page_number, page_text in pages:
+            if page_text.strip():
+                pending.append((page_number, page_text, 'pdfplumber'))
+            else:
+                if pool is None:
+                    pool = ProcessPoolExecutor(max_workers=workers)
+                if filepath is None:
+                    with _open_binary(source) as f:
+                        tmp_path = filepath = _spool_to_tempfile(f)
+                pending.append((page_number, pool.submit(_ocr_pdf_page, filepath, page_number), 'ocr'))
+                in_flight += 1
+            while pending and (not isinstance(pending[0][1], Future) or pending[0][1].done()
+                               or in_flight >= 2 * workers):
+                in_flight -= isinstance(pending[0][1], Future)
+                yield _resolve_ocr_page(*pending.popleft())
+        while pending:
+            yield _resolve_ocr_page(*pending.popleft())
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        if tmp_path and os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+def _resolve_ocr_page(page_number: int, result, extractor: str) -> Tuple[int, str, str]:
+    if not isinstance(result, Future):
+        return page_number, result, extractor
+    try:
+        page_text = result.result()
+        logger.info(f"OCR of scanned page {page_number}: {len(page_text)} chars")
+        return page_number, page_text, extractor
+    except Exception as e:
+        logger.warning(f"OCR of scanned page {page_number} failed: {e}")
+        return page_number, "", extractor
+
+def _render_pdf_page(source: Source, page_number: int) -> Image.Image:
+    """Rasterise one PDF page at PDF_OCR_RESOLUTION."""
+    import pdfplumber
+    with _open_binary(source) as f, pdfplumber.open(f) as pdf:
+        return pdf.pages[page_number - 1].to_image(resolution=PDF_OCR_RESOLUTION).original
+
+def _ocr_pdf_page(filepath: str, page_number: int) -> str:
+    """Process-pool worker: rasterise one PDF page and OCR it."""
+    return _ocr_page_image(_render_pdf_page(filepath, page_number))
+
+def _ocr_page_image(image: Image.Image) -> str:
+    """OCR a rasterised page through the standard pipeline."""
+    enhanced_image = enhance_image_for_ocr(image)
+    return pytesseract.image_to_string(enhanced_image, config='--psm 6', timeout=OCR_STRATEGY_TIMEOUT)
+
+def _pdfplumber_pages(source: Source, start: int, end: int) -> Iterator[Tuple[int, str]]:
+    """Extract pages [start, end) with pdfplumber as (page_number, text) pairs."""
+    import pdfplumber
+    with _open_binary(source) as f, pdfplumber.open(f) as pdf:
+        for page in pdf.pages[start:end]:
+            page_text = page.extract_text() or ""
+            page.flush_cache()  # drop parsed layout objects once the text is out
+            yield page.page_number, page_text
+
+def _pypdf2_pages(source: Source, start: int, end: int) -> Iterator[Tuple[int, str]]:
+    """Extract pages [start, end) with PyPDF2 as (page_number, text) pairs."""
+    import PyPDF2
+    with _open_binary(source) as f:
+        pdf_reader = PyPDF2.PdfReader(f)
+        for page_num in range(start, end):
+            yield page_num + 1, pdf_reader.pages[page_num].extract_text() or ""
+
+def _collect_pages(pages_fn, filepath: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Process-pool worker: run a page iterator over one shard and return its pages."""
+    return list(pages_fn(filepath, start, end))
 
-def _extract_docx(filepath: str) -> str:
+def _page_shards(page_count: int, workers: int, start: int = 0) -> List[Tuple[int, int]]:
+    """Split ``range(start, page_count)`` into contiguous (start, end) shards.
+
+    A few shards per worker keeps the pool busy when some pages are much
+    heavier than others (tables, scanned figures).
+    """
+    shard_size = max(1, -(-(page_count - start) // (workers * PDF_SHARDS_PER_WORKER)))
+    return [(first, min(first + shard_size, page_count)) for first in range(start, page_count, shard_size)]
+
+def _iter_page_shards(pages_fn, source: Source, page_count: int,
+                      workers: Optional[int] = None, start: int = 0) -> Iterator[Tuple[int, str]]:
+    """Run a page iterator over the whole document, in parallel when worthwhile.
+
+    At most ``2 * workers`` shards are in flight, so memory stays bounded
+    even when the consumer is slower than the pool. Workers open the
+    document by path, so an in-memory source big enough to shard is
+    spooled to a temp file (in blocks) for the lifetime of the pool.
+    """
+    workers = max(1, workers or PDF_WORKERS)
+    if workers == 1 or page_count - start < PDF_PARALLEL_MIN_PAGES:
+        yield from pages_fn(source, start, page_count)
+        return
+    tmp_path = None
+    if isinstance(source, str):
+        filepath = source
+    else:
+        with _open_binary(source) as f:
+            tmp_path = filepath = _spool_to_tempfile(f)
+    
+    shards = iter(_page_shards(page_count, workers, start))
+    logger.info(f"Extracting {page_count - start} pages on {workers} workers")
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        in_flight = deque(pool.submit(_collect_pages, pages_fn, filepath, first, last)
+                          for first, last in islice(shards, workers * 2))
+        while in_flight:
+            # Shards are consumed in submission order, so pages stay ordered
+            pages = in_flight.popleft().result()
+            for first, last in islice(shards, 1):
+                in_flight.append(pool.submit(_collect_pages, pages_fn, filepath, first, last))
+            yield from pages
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        if tmp_path and os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+def _extract_docx(source: Source) -> str:
     """Extract text from DOCX files with fallback"""
+    return _join_records(_iter_docx(source))
+
+def _iter_docx(source: Source) -> Iterator[PageRecord]:
+    """Stream DOCX paragraphs in groups with fallback"""
     # Try python-docx first
     try:
         from docx import Document
-        doc = Document(filepath)
-        text = "\n".join([para.text for para in doc.paragraphs if para.text.strip()])
-        logger.info(f"DOCX extraction with python-docx: {len(text)} chars")
-        if text:
-            return text
+        with _open_binary(source) as f:
+            doc = Document(f)
+        paragraphs = (para.text for para in doc.paragraphs if para.text.strip())
+        group_number = 0
+        while True:
+            group = list(islice(paragraphs, DOCX_PARAGRAPHS_PER_RECORD))
+            if not group:
+                break
+            group_number += 1
+            yield PageRecord(group_number, "\n".join(group), 'python-docx')
+        logger.info(f"DOCX extraction with python-docx: {group_number} paragraph groups")
+        if group_number:
+            return
     except ImportError:
         logger.warning("python-docx not available, trying docx2txt...")
     except Exception as e:
@@ -159,10 +516,12 @@ def _extract_docx(filepath: str) -> str:
     # Fallback to docx2txt
     try:
         import docx2txt
-        text = docx2txt.process(filepath)
+        with _open_binary(source) as f:
+            text = docx2txt.process(f)
         logger.info(f"DOCX extraction with docx2txt: {len(text)} chars")
         if text:
-            return text
+            yield PageRecord(1, text, 'docx2txt')
+            return
     except ImportError:
         logger.warning("docx2txt not available")
     except Exception as e:
@@ -170,47 +529,35 @@ def _extract_docx(filepath: str) -> str:
     
     # If all methods fail
     logger.error("No DOCX extraction library available")
-    return "📋 Install python-docx: pip install python-docx\nOr install docx2txt: pip install docx2txt"
+    yield PageRecord(0, "📋 Install python-docx: pip install python-docx\nOr install docx2txt: pip install docx2txt", 'error')
+
+def _iter_image(source: Source) -> Iterator[PageRecord]:
+    """Stream OCR text from an image as a single record"""
+    text = _extract_image(source)
+    failed = not tesseract_available or text.startswith(("🔍", "🚫"))
+    yield PageRecord(1, text, 'error' if failed else 'tesseract')
 
-def _extract_image(filepath: str) -> str:
-    """Extract text from images using OCR with multiple fallback strategies"""
+def _extract_image(source: Source) -> str:
+    """Extract text from images using OCR, racing multiple strategies in parallel"""
     if not tesseract_available:
         logger.warning("OCR not available for image extraction")
         return "🔍 Tesseract OCR not available. Install: pip install pytesseract and install tesseract-ocr"
     
     try:
-        original_image = Image.open(filepath)
+        with _open_binary(source) as f:
+            original_image = Image.open(f)
+            original_image.load()  # decode once up front; threads then share the pixels
         logger.info(f"Processing image: {original_image.size}, mode: {original_image.mode}")
         
-        # Strategy 1: Try with original image first
-        text = pytesseract.image_to_string(original_image, config='--psm 6')
-        if text.strip():
-            logger.info(f"OCR successful with original image: {len(text)} chars")
-            return text
-        
-        # Strategy 2: Try with enhanced image
-        enhanced_image = enhance_image_for_ocr(original_image)
-        text = pytesseract.image_to_string(enhanced_image, config='--psm 6')
-        if text.strip():
-            logger.info(f"OCR successful with enhanced image: {len(text)} chars")
+        variants = _ImageVariants(original_image)
+        try:
+            text, strategy = _race_ocr_strategies(variants)
+        finally:
+            variants.close()
+        if text:
+            logger.info(f"OCR successful with strategy {strategy}: {len(text)} chars")
             return text
         
-        # Strategy 3: Try different PSM modes
-        psm_modes = [
-            ('1', 'Automatic page segmentation with OSD'),
-            ('3', 'Fully automatic page segmentation'),
-            ('4', 'Assume a single column of text'),
-            ('6', 'Assume a single uniform block of text'),
-            ('11', 'Sparse text'),
-            ('12', 'Sparse text with OSD')
-        ]
-        
-        for psm, description in psm_modes:
-            text = pytesseract.image_to_string(original_image, config=f'--psm {psm}')
-            if text.strip():
-                logger.info(f"OCR successful with PSM mode {psm}: {description}, {len(text)} chars")
-                return text
-        
         logger.warning("No text detected in image after trying multiple OCR strategies")
         return "🔍 No text detected in image after trying multiple OCR strategies"
         
@@ -218,6 +565,163 @@ def _extract_image(filepath: str) -> str:
         logger.error(f"OCR Error: {e}")
         return f"🚫 OCR Error: {str(e)}"
 
+def _prepare_for_ocr(image: Image.Image) -> Image.Image:
+    """Flatten transparency onto white and convert to a mode Tesseract reads (1, L or RGB)."""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    if image.mode in ('1', 'L', 'RGB'):
+        return image
+    return image.convert('RGB')  # CMYK, YCbCr, palette, 16-bit...
+
+class _ImageVariants:
+    """Lazily computed, shared image variants so each is built at most once per image.
+
+    Each variant is also written to one temp PNG (see path()), shared by
+    every strategy that uses it; close() removes them.
+    """
+    
+    def __init__(self, original: Image.Image):
+        self._variants = {'original': _prepare_for_ocr(original)}
+        self._paths: Dict[str, str] = {}
+        self._lock = threading.RLock()
+    
+    def path(self, name: str) -> str:
+        """Temp PNG of the variant, written on first use."""
+        with self._lock:
+            if name not in self._paths:
+                image = self.get(name)
+                with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as tmp_file:
+                    image.save(tmp_file, format='PNG')
+                    self._paths[name] = tmp_file.name
+            return self._paths[name]
+    
+    def close(self) -> None:
+        with self._lock:
+            for path in self._paths.values():
+                if os.path.exists(path):
+                    os.unlink(path)
+            self._paths.clear()
+    
+    def get(self, name: str) -> Image.Image:
+        variant = self._variants.get(name)
+        if variant is not None:
+            return variant
+        with self._lock:
+            if name not in self._variants:
+                if name == 'grayscale':
+                    original = self._variants['original']
+                    self._variants[name] = original if original.mode == 'L' else original.convert('L')
+                elif name == 'enhanced':
+                    self._variants[name] = enhance_image_for_ocr(self.get('grayscale'))
+                else:
+                    raise ValueError(f"Unknown image variant: {name}")
+            return self._variants[name]
+
+class _OCRRace:
+    """Tesseract subprocesses of one image, so the losers can be killed once a winner is known."""
+    
+    def __init__(self):
+        self.cancelled = False
+        self._processes = set()
+        self._lock = threading.Lock()
+    
+    def run(self, image_path: str, psm: str) -> str:
+        """OCR an image file with `tesseract --psm psm`; returns "" if the race was cancelled."""
+        with self._lock:
+            if self.cancelled:
+                return ""
+            process = subprocess.Popen([pytesseract.pytesseract.tesseract_cmd, image_path, 'stdout', '--psm', psm],
+                                       stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            self._processes.add(process)
+        try:
+            out, err = process.communicate(timeout=OCR_STRATEGY_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise RuntimeError(f"Tesseract timed out after {OCR_STRATEGY_TIMEOUT}s")
+        finally:
+            with self._lock:
+                self._processes.discard(process)
+        if self.cancelled:
+            return ""
+        if process.returncode != 0:
+            raise RuntimeError(err.decode('utf-8', 'ignore').strip() or f"Tesseract exited with {process.returncode}")
+        return out.decode('utf-8', 'ignore')
+    
+    def cancel(self) -> None:
+        """Stop strategies that haven't started and kill running Tesseract processes."""
+        with self._lock:
+            self.cancelled = True
+            for process in self._processes:
+                process.kill()
+
+def _run_ocr_strategy(variants: _ImageVariants, strategy: Tuple[str, str, str], race: _OCRRace) -> str:
+    """Run one OCR strategy and record its timing (unless it was cut short by the race)."""
+    name, variant, psm = strategy
+    started = time.perf_counter()
+    text = ""
+    try:
+        text = race.run(variants.path(variant), psm)
+        return text
+    finally:
+        if not race.cancelled:
+            _record_ocr_timing(name, time.perf_counter() - started, bool(text.strip()))
+
+def _race_ocr_strategies(variants: _ImageVariants) -> Tuple[str, Optional[str]]:
+    """
+    Run all OCR strategies concurrently and return the highest-priority non-empty result
+    
+    A result is accepted only once every strategy before it in
+    OCR_STRATEGIES has come back empty, so the answer is the same as trying
+    them one by one (and safe to cache), just faster. As soon as it is
+    known, queued strategies are cancelled and running Tesseract processes
+    are killed.
+    
+    Returns:
+        Tuple of (text, winning strategy name), or ("", None) if all came back empty
+    """
+    race = _OCRRace()
+    pool = ThreadPoolExecutor(max_workers=OCR_WORKERS, thread_name_prefix="ocr")
+    futures = [pool.submit(_run_ocr_strategy, variants, strategy, race) for strategy in OCR_STRATEGIES]
+    try:
+        for (name, _, _), future in zip(OCR_STRATEGIES, futures):
+            try:
+                text = future.result()
+            except Exception as e:
+                logger.warning(f"OCR strategy {name} failed: {e}")
+                continue
+            if text.strip():
+                with _ocr_stats_lock:
+                    _ocr_stats[name]['wins'] += 1
+                return text, name
+        return "", None
+    finally:
+        race.cancel()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def _record_ocr_timing(name: str, seconds: float, found_text: bool) -> None:
+    with _ocr_stats_lock:
+        stats = _ocr_stats.setdefault(name, {'runs': 0, 'wins': 0, 'with_text': 0, 'total_seconds': 0.0})
+        stats['runs'] += 1
+        stats['with_text'] += int(found_text)
+        stats['total_seconds'] += seconds
+
+def get_ocr_strategy_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Per-strategy OCR timing, for tuning OCR_STRATEGIES order
+    
+    Returns:
+        Dictionary of strategy name -> runs, wins, with_text, total_seconds, avg_seconds
+    """
+    with _ocr_stats_lock:
+        return {
+            name: dict(stats, avg_seconds=stats['total_seconds'] / stats['runs'] if stats['runs'] else 0.0)
+            for name, stats in _ocr_stats.items()
+        }
+
 def enhance_image_for_ocr(image: Image.Image) -> Image.Image:
     """
     Enhance image for better OCR results
@@ -334,7 +838,7 @@ def get_file_info(uploaded_file) -> Dict[str, Any]:
         'size': uploaded_file.size,
         'size_kb': uploaded_file.size / 1024,
         'size_mb': uploaded_file.size / (1024 * 1024),
-        'ocr_available': tesseract_available if file_ext in ['jpg', 'jpeg', 'png', 'bmp'] else None
-
+        'ocr_available': tesseract_available if file_ext in ['jpg', 'jpeg', 'png', 'bmp'] else None,
+        'cache': get_cache_stats()
     }
 
@@ -1,7 +1,14 @@
+import io
 import os
+import time
+import random
+import struct
+import logging
 import tempfile
 import asyncio
-from typing import List, Tuple
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 
 import edge_tts  # type: ignore
 
@@ -23,6 +30,27 @@ try:
 except Exception:
     CoquiTTS = None  # type: ignore
 
+from chunking import chunk_by_paragraphs, chunk_sections, split_sentences
+import encoding
+from render_cache import render_cache, render_key
+from tts_models import model_registry
+
+DEFAULT_COQUI_MODEL = "tts_models/en/ljspeech/tacotron2-DDC"
+# Coqui input is synthesised in sentence-packed pieces of at most this many characters,
+# never spanning paragraphs, so an edit only changes the render keys of its own paragraph
+COQUI_CHUNK_CHARS = int(os.getenv("COQUI_CHUNK_CHARS", "400"))
+
+# Edge-TTS: consecutive paragraphs are packed into pieces of at most EDGE_CHUNK_CHARS
+# characters, cut after content-chosen paragraphs (stable_cuts) so an edit only changes
+# the render keys of the pieces around it; pieces are synthesised EDGE_CONCURRENCY at a
+# time, each retried up to EDGE_MAX_RETRIES times
+EDGE_CHUNK_CHARS = int(os.getenv("EDGE_CHUNK_CHARS", "3000"))
+EDGE_CONCURRENCY = int(os.getenv("EDGE_CONCURRENCY", "4"))
+EDGE_MAX_RETRIES = int(os.getenv("EDGE_MAX_RETRIES", "3"))
+EDGE_BACKOFF_SECONDS = float(os.getenv("EDGE_BACKOFF_SECONDS", "1.0"))
+
+logger = logging.getLogger(__name__)
+
 
 def _rate_to_percentage(rate_wpm: int) -> str:
     try:
@@ -38,28 +66,48 @@ def synthesize_audio_chunks(
     chunks: List[str],
     rate: int = BASE_WPM,
     voice_name: str = "",
+    on_progress: Optional[Callable[[float], None]] = None,
+    communicate_factory: Optional[Callable[..., Any]] = None,
+    use_cache: bool = True,
+    audio_format: Optional[str] = None,
 ) -> Tuple[str, str]:
     """
     Try Coqui TTS first (offline/locally cached). If unavailable or fails, use Edge-TTS.
     On Edge 403 and ALLOW_TEMP_FALLBACK=true, fallback to gTTS.
+    on_progress, if given, is called with the fraction of work done (0.0-1.0).
+    communicate_factory replaces edge_tts.Communicate (see synthesize_edge_mp3).
+    With use_cache, pieces already in the render cache (same text, engine,
+    model/voice and rate) are reused, so a rerun only renders what changed.
+    Coqui audio is encoded to audio_format (default AUDIO_FORMAT, see
+    encoding.py) piece by piece while synthesis runs; "wav", or no ffmpeg,
+    keeps WAV. Edge-TTS output is always MP3.
     Returns (output_path, used_format).
     """
     text = "\n\n".join(chunks)
 
-    # 1) Try Coqui TTS → WAV
+    # 1) Try Coqui TTS → compressed (or WAV)
     if CoquiTTS is not None:
         try:
-            model_name = os.getenv("COQUI_MODEL", "tts_models/en/ljspeech/tacotron2-DDC")
-            tts = CoquiTTS(model_name=model_name)
-            fd_wav, wav_path = tempfile.mkstemp(suffix=".wav")
-            os.close(fd_wav)
-            tts.tts_to_file(text=text, file_path=wav_path)
-            return wav_path, "wav"
-        except Exception:
+            model_name = os.getenv("COQUI_MODEL", DEFAULT_COQUI_MODEL)
+            fmt = encoding.output_format(audio_format)
+            try:
+                out_path = _synthesize_coqui(text, model_name, fmt, on_progress, use_cache)
+            except encoding.EncodingError as e:
+                if not fmt:
+                    raise
+                # Keep the engine and voice; only the container changes. The
+                # pieces rendered so far are in the render cache, so reuse them.
+                logger.warning(f"{fmt} encoding failed ({e}), writing WAV instead")
+                fmt = None
+                out_path = _synthesize_coqui(text, model_name, None, on_progress, use_cache=True)
+            if on_progress:
+                on_progress(1.0)
+            return out_path, fmt or "wav"
+        except Exception as e:
             # Proceed to Edge-TTS fallback
-            pass
+            logger.warning(f"Coqui TTS failed ({e}), using Edge-TTS")
 
-    # 2) Edge-TTS → MP3
+    # 2) Edge-TTS → MP3, chunk by chunk in parallel
     voice = voice_name or DEFAULT_EDGE_VOICE
     rate_pct = _rate_to_percentage(rate)
     fd_mp3, mp3_path = tempfile.mkstemp(suffix=".mp3")
@@ -67,44 +115,317 @@ def synthesize_audio_chunks(
 
     async def _run_edge():
         try:
-            communicate = edge_tts.Communicate(text, voice=voice, rate=rate_pct)
-            with open(mp3_path, "wb") as f:
-                async for chunk in communicate.stream():
-                    if chunk["type"] == "audio":
-                        f.write(chunk["data"])
+            await synthesize_edge_mp3(
+                _edge_pieces(text), voice, rate_pct, mp3_path,
+                on_progress=on_progress, communicate_factory=communicate_factory,
+                use_cache=use_cache,
+            )
         except Exception as e:
-            error_msg = str(e)
-            if ("403" in error_msg or "WSServerHandshakeError" in error_msg) and gTTS is not None:
+            if _is_edge_blocked(e) and gTTS is not None:
                 _fallback_with_gtts(text, mp3_path)
                 return
-            if "403" in error_msg or "WSServerHandshakeError" in error_msg:
-                raise TTSError(
-                    "Edge-TTS is blocked or unavailable (403), and gTTS fallback is unavailable or failed. Try again later."
-                )
-            if "429" in error_msg or "Too Many Requests" in error_msg:
-                raise TTSError(
-                    "Edge-TTS rate limit exceeded (429). Please wait and retry or reduce text size."
-                )
-            raise TTSError(f"Edge-TTS error: {error_msg}")
-
-    # ✅ FIX: Run async safely within FastAPI event loop
+            raise _edge_error(e)
+
+    _run_sync(_run_edge())
+    if on_progress:
+        on_progress(1.0)
+    return mp3_path, "mp3"
+
+
+def _synthesize_coqui(
+    text: str,
+    model_name: str,
+    fmt: Optional[str],
+    on_progress: Optional[Callable[[float], None]] = None,
+    use_cache: bool = True,
+) -> str:
+    """Render text with Coqui into a temp file, encoded to fmt as it goes (None = WAV).
+
+    The temp file is removed if anything fails.
+    """
+    import numpy as np
+    extension = encoding.FORMATS[fmt][1] if fmt else "wav"
+    fd_out, out_path = tempfile.mkstemp(suffix=f".{extension}")
+    os.close(fd_out)
+    pieces = chunk_by_paragraphs(text, COQUI_CHUNK_CHARS)
+    wav = []
+    encoder = None
     try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            # Schedule coroutine safely if inside an async loop
-            asyncio.run_coroutine_threadsafe(_run_edge(), loop).result()
-        else:
-            loop.run_until_complete(_run_edge())
+        with model_registry.using(model_name) as tts:
+            if fmt:
+                encoder = encoding.StreamEncoder(out_path, tts.synthesizer.output_sample_rate, fmt=fmt)
+            for done, piece in enumerate(pieces, 1):
+                # Reuse pieces rendered by an earlier (possibly crashed) run
+                key = render_key(piece, engine="coqui", model=model_name)
+                data = render_cache.get_bytes(key) if use_cache else None
+                if data is None:
+                    audio = np.asarray(tts.tts(text=piece), dtype=np.float32)
+                    render_cache.set_bytes(key, audio.tobytes())
+                else:
+                    audio = np.frombuffer(data, dtype=np.float32)
+                if encoder:
+                    # ffmpeg encodes this piece while the next one is synthesised
+                    encoder.write(audio)
+                else:
+                    wav.append(audio)
+                if on_progress:
+                    on_progress(done / len(pieces))
+            if encoder:
+                encoder.close()
+            else:
+                tts.synthesizer.save_wav(wav=np.concatenate(wav), path=out_path)
+        return out_path
+    except Exception:
+        if encoder:
+            encoder.abort()
+        if os.path.exists(out_path):
+            os.remove(out_path)
+        raise
+
+
+def _edge_pieces(text: str) -> List[str]:
+    """Paragraphs packed up to EDGE_CHUNK_CHARS (long ones split by sentences), page markers dropped."""
+    return [chunk.text for chunk in chunk_sections(text, EDGE_CHUNK_CHARS, stable_cuts=True)]
+
+
+async def synthesize_edge_mp3(
+    pieces: List[str],
+    voice: str,
+    rate_pct: str,
+    out_path: str,
+    on_progress: Optional[Callable[[float], None]] = None,
+    communicate_factory: Optional[Callable[..., Any]] = None,
+    concurrency: int = EDGE_CONCURRENCY,
+    use_cache: bool = True,
+) -> None:
+    """
+    Synthesise pieces concurrently with Edge-TTS and write one MP3 in order.
+
+    At most `concurrency` requests run at once; each piece is retried on its
+    own (see _edge_piece_with_retry), so one 429 no longer loses the book.
+    Edge returns headerless MP3 frames, so pieces are stitched by appending
+    bytes, without re-encoding. communicate_factory defaults to
+    edge_tts.Communicate; pass another factory (e.g. one pointed at a local
+    fake server) for tests. With use_cache, each piece is checkpointed in
+    the render cache and reused on the next run.
+    """
+    factory = communicate_factory or edge_tts.Communicate
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    tasks = [
+        asyncio.ensure_future(_edge_piece_with_retry(
+            piece, voice, rate_pct, factory, semaphore,
+            render_key(piece, engine="edge-tts", voice=voice, rate=rate_pct) if use_cache else None,
+        ))
+        for piece in pieces
+    ]
+    try:
+        with open(out_path, "wb") as f:
+            # Write in text order while later pieces are still being synthesised
+            for done, task in enumerate(tasks, 1):
+                f.write(await task)
+                if on_progress:
+                    on_progress(done / len(tasks))
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _edge_piece_with_retry(
+    text: str,
+    voice: str,
+    rate_pct: str,
+    factory: Callable[..., Any],
+    semaphore: asyncio.Semaphore,
+    cache_key: Optional[str] = None,
+) -> bytes:
+    """One piece's MP3 bytes, retried with exponential backoff and jitter.
+
+    A blocked service (403) is not retried; synthesize_audio_chunks falls
+    back to gTTS for the whole text instead.
+    """
+    if cache_key:
+        cached = render_cache.get_bytes(cache_key)
+        if cached is not None:
+            return cached
+    attempt = 0
+    while True:
+        async with semaphore:
+            try:
+                audio = bytearray()
+                async for chunk in factory(text, voice=voice, rate=rate_pct).stream():
+                    if chunk["type"] == "audio":
+                        audio.extend(chunk["data"])
+                if cache_key and audio:
+                    render_cache.set_bytes(cache_key, bytes(audio))
+                return bytes(audio)
+            except (ValueError, TypeError):
+                raise
+            except Exception as e:
+                if _is_edge_blocked(e) or attempt >= EDGE_MAX_RETRIES:
+                    raise
+                error = e
+        # Back off outside the semaphore so other pieces keep going
+        delay = EDGE_BACKOFF_SECONDS * (2 ** attempt) * (0.5 + random.random())
+        attempt += 1
+        logger.warning(f"Edge-TTS piece failed ({error}), retry {attempt}/{EDGE_MAX_RETRIES} in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+
+def _run_sync(coro) -> None:
+    """Run a coroutine to completion from synchronous code."""
+    try:
+        asyncio.get_running_loop()
     except RuntimeError:
-        # Create a new event loop if none exists
-        asyncio.run(_run_edge())
+        # Normal case (CLI, worker threads, job queue): no loop in this thread
+        asyncio.run(coro)
+        return
+    # Called from inside a running loop: waiting on that same loop would
+    # deadlock, so give the coroutine its own loop on a helper thread.
+    # Async callers should prefer open_audio_stream() or a thread pool.
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pool.submit(asyncio.run, coro).result()
 
-    return mp3_path, "mp3"
+
+def _is_edge_blocked(e: Exception) -> bool:
+    error_msg = str(e)
+    return "403" in error_msg or "WSServerHandshakeError" in error_msg
+
+
+def _edge_error(e: Exception) -> TTSError:
+    """Translate an Edge-TTS failure into a user-facing TTSError."""
+    error_msg = str(e)
+    if _is_edge_blocked(e):
+        return TTSError(
+            "Edge-TTS is blocked or unavailable (403), and gTTS fallback is unavailable or failed. Try again later."
+        )
+    if "429" in error_msg or "Too Many Requests" in error_msg:
+        return TTSError(
+            "Edge-TTS rate limit exceeded (429). Please wait and retry or reduce text size."
+        )
+    return TTSError(f"Edge-TTS error: {error_msg}")
+
+
+# ----------- Streaming synthesis -----------
+
+_stream_metrics: Dict[str, float] = {"streams": 0, "total_ttfa_seconds": 0.0, "last_ttfa_seconds": 0.0}
+_stream_metrics_lock = threading.Lock()
+
+
+async def open_audio_stream(
+    chunks: List[str],
+    rate: int = BASE_WPM,
+    voice_name: str = "",
+) -> Tuple[str, AsyncIterator[bytes]]:
+    """
+    Start synthesis and return (format, async iterator of audio bytes).
+
+    Same engine order as synthesize_audio_chunks, but audio is yielded as it
+    is produced: Coqui renders sentence by sentence into a streamed WAV,
+    Edge-TTS frames are passed through as they arrive. Time-to-first-audio
+    is recorded (see get_stream_metrics()).
+    """
+    text = "\n\n".join(chunks)
+    started = time.perf_counter()
+
+    if CoquiTTS is not None:
+        model_name = os.getenv("COQUI_MODEL", DEFAULT_COQUI_MODEL)
+        try:
+            # Load up front so a broken model falls back to Edge before any bytes are sent
+            await asyncio.to_thread(model_registry.get, model_name)
+            return "wav", _time_to_first_audio(_stream_coqui(text, model_name), started)
+        except Exception as e:
+            logger.warning(f"Coqui TTS unavailable for streaming ({e}), using Edge-TTS")
+
+    voice = voice_name or DEFAULT_EDGE_VOICE
+    return "mp3", _time_to_first_audio(_stream_edge(text, voice, _rate_to_percentage(rate)), started)
+
+
+def _wav_stream_header(sample_rate: int, channels: int = 1, bits: int = 16) -> bytes:
+    """WAV header for a stream of unknown length (sizes set to the maximum)."""
+    block_align = channels * bits // 8
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 0xFFFFFFFF, b"WAVE",
+        b"fmt ", 16, 1, channels, sample_rate, sample_rate * block_align, block_align, bits,
+        b"data", 0xFFFFFFFF,
+    )
+
+
+def _coqui_sentence_pcm(model_name: str, sentence: str) -> bytes:
+    import numpy as np
+    with model_registry.using(model_name) as tts:
+        audio = np.asarray(tts.tts(text=sentence), dtype=np.float32)
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+async def _stream_coqui(text: str, model_name: str) -> AsyncIterator[bytes]:
+    tts = model_registry.get(model_name)
+    header = _wav_stream_header(tts.synthesizer.output_sample_rate)
+    for sentence in split_sentences(text):
+        # Inference blocks, so keep it off the event loop
+        pcm = await asyncio.to_thread(_coqui_sentence_pcm, model_name, sentence)
+        # The header goes out with the first sentence's audio, so the first
+        # bytes (and time to first audio) mean synthesis actually succeeded
+        yield header + pcm
+        header = b""
+    if header:
+        yield header
+
+
+async def _stream_edge(text: str, voice: str, rate_pct: str) -> AsyncIterator[bytes]:
+    sent_audio = False
+    try:
+        communicate = edge_tts.Communicate(text, voice=voice, rate=rate_pct)
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                sent_audio = True
+                yield chunk["data"]
+    except Exception as e:
+        # gTTS can only take over if the client hasn't received Edge audio yet
+        if _is_edge_blocked(e) and gTTS is not None and not sent_audio:
+            yield await asyncio.to_thread(_gtts_bytes, text)
+            return
+        raise _edge_error(e)
+
+
+async def _time_to_first_audio(stream: AsyncIterator[bytes], started: float) -> AsyncIterator[bytes]:
+    """Pass a stream through, recording the delay until its first audio bytes."""
+    first = True
+    async for data in stream:
+        if first and data:
+            first = False
+            ttfa = time.perf_counter() - started
+            with _stream_metrics_lock:
+                _stream_metrics["streams"] += 1
+                _stream_metrics["total_ttfa_seconds"] += ttfa
+                _stream_metrics["last_ttfa_seconds"] = ttfa
+            logger.info(f"Time to first audio: {ttfa:.2f}s")
+        yield data
+
+
+def get_stream_metrics() -> Dict[str, float]:
+    """Time-to-first-audio statistics for streamed synthesis."""
+    with _stream_metrics_lock:
+        streams = _stream_metrics["streams"]
+        return dict(
+            _stream_metrics,
+            avg_ttfa_seconds=_stream_metrics["total_ttfa_seconds"] / streams if streams else 0.0,
+        )
+
+
+def _gtts_bytes(text: str) -> bytes:
+    buffer = io.BytesIO()
+    _write_gtts(text, buffer)
+    return buffer.getvalue()
 
 
 def _fallback_with_gtts(text: str, out_path: str) -> None:
+    with open(out_path, "wb") as f:
+        _write_gtts(text, f)
+
+
+def _write_gtts(text: str, fp) -> None:
     if gTTS is None:
         raise TTSError("gTTS fallback requested but gTTS is not installed.")
     tts = gTTS(text=text, lang=os.getenv("GTTS_LANG", "en"), tld=os.getenv("GTTS_TLD", "com"))
-    with open(out_path, "wb") as f:
-        tts.write_to_fp(f)
+    tts.write_to_fp(fp)
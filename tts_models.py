@@ -0,0 +1,157 @@
+"""
+Process-wide TTS model registry
+
+Loading a Coqui/XTTS model takes seconds and hundreds of MB, so models are
+loaded once per process and shared:
+
+- lazy load on first use, with concurrent requests for the same model
+  waiting on a single load
+- warm_up() to preload models (the API does this on startup)
+- an LRU cap on resident models (TTS_MAX_MODELS, default 2)
+- per-model load time, memory and usage metrics via stats()
+
+Models are not safe for concurrent inference, so callers use
+``with model_registry.using(name) as tts:`` which serialises calls per model.
+
+Environment variables:
+- TTS_MAX_MODELS: maximum number of resident models
+- TTS_USE_GPU: load models on the GPU ("true"/"false")
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    from TTS.api import TTS as CoquiTTS  # type: ignore
+except Exception:
+    CoquiTTS = None  # type: ignore
+
+
+def _rss_mb() -> Optional[float]:
+    """Current resident set size of this process in MB, if it can be measured."""
+    try:
+        import psutil  # type: ignore
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except Exception:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except Exception:
+        return None
+
+
+class _Entry:
+    def __init__(self):
+        self.model: Any = None
+        self.load_lock = threading.Lock()   # held while loading
+        self.infer_lock = threading.Lock()  # held while synthesising
+        self.metrics: Dict[str, Any] = {"loads": 0, "uses": 0, "load_seconds": None, "rss_delta_mb": None}
+
+
+class ModelRegistry:
+    """Thread-safe, LRU-capped cache of loaded TTS models keyed by model name."""
+
+    def __init__(self, max_models: int = 2, gpu: bool = False):
+        self.max_models = max(1, max_models)
+        self.gpu = gpu
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    def get(self, model_name: str) -> Any:
+        """Return the loaded model, loading it on first use."""
+        with self._lock:
+            entry = self._entries.get(model_name)
+            if entry is None:
+                entry = self._entries[model_name] = _Entry()
+            self._entries.move_to_end(model_name)
+            entry.metrics["uses"] += 1
+
+        if entry.model is None:
+            # Per-model lock: other models stay usable while this one loads
+            with entry.load_lock:
+                if entry.model is None:
+                    entry.model = self._load(model_name, entry)
+                    self._evict_over_cap()
+        return entry.model
+
+    @contextmanager
+    def using(self, model_name: str) -> Iterator[Any]:
+        """Borrow a model for inference; calls on the same model are serialised."""
+        model = self.get(model_name)
+        with self._lock:
+            entry = self._entries[model_name]
+        with entry.infer_lock:
+            yield model
+
+    def _load(self, model_name: str, entry: _Entry) -> Any:
+        if CoquiTTS is None:
+            raise RuntimeError("Coqui TTS not installed. pip install TTS")
+        rss_before = _rss_mb()
+        started = time.perf_counter()
+        model = CoquiTTS(model_name=model_name, gpu=self.gpu)
+        seconds = time.perf_counter() - started
+        rss_after = _rss_mb()
+        entry.metrics["loads"] += 1
+        entry.metrics["load_seconds"] = round(seconds, 3)
+        if rss_before is not None and rss_after is not None:
+            entry.metrics["rss_delta_mb"] = round(rss_after - rss_before, 1)
+        logger.info(f"Loaded TTS model {model_name} in {seconds:.1f}s")
+        return model
+
+    def _evict_over_cap(self) -> None:
+        """Drop least-recently-used loaded models beyond max_models."""
+        with self._lock:
+            loaded = [name for name, entry in self._entries.items() if entry.model is not None]
+            for name in loaded[: max(0, len(loaded) - self.max_models)]:
+                entry = self._entries[name]
+                # Don't pull a model out from under a running synthesis
+                if entry.infer_lock.acquire(blocking=False):
+                    try:
+                        entry.model = None
+                        logger.info(f"Evicted TTS model {name}")
+                    finally:
+                        entry.infer_lock.release()
+
+    def evict(self, model_name: str) -> None:
+        """Unload a model; it is reloaded lazily on next use."""
+        with self._lock:
+            entry = self._entries.get(model_name)
+        if entry is not None:
+            with entry.infer_lock:
+                entry.model = None
+
+    def warm_up(self, model_names: Iterable[str]) -> None:
+        """Preload models, logging (not raising) failures."""
+        for name in model_names:
+            try:
+                self.get(name)
+            except Exception as e:
+                logger.warning(f"TTS warm-up failed for {name}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Load time, memory and usage metrics for every known model."""
+        with self._lock:
+            return {
+                "max_models": self.max_models,
+                "rss_mb": _rss_mb(),
+                "models": {
+                    name: dict(entry.metrics, loaded=entry.model is not None)
+                    for name, entry in self._entries.items()
+                },
+            }
+
+
+model_registry = ModelRegistry(
+    max_models=int(os.getenv("TTS_MAX_MODELS", "2")),
+    gpu=os.getenv("TTS_USE_GPU", "false").lower() in ("1", "true", "yes"),
+)